@@ -1,7 +1,5 @@
 from django.contrib.auth.models import (User,Group)
 
+#the group names used by the permission checks; the membership is checked against the login user's groups at request time
 for attr,name in (("FMSB","Fire Management Services Branch"),):
-    try:
-        setattr(Group,attr,Group.objects.get(name=name))
-    finally:
-        setattr(Group,attr,None)
+    setattr(Group,attr,name)
@@ -3,6 +3,7 @@ from django.contrib.auth.models import (User,Group)
 from django_auth.filters import (UserFilter,)
 from django_auth.forms import (UserListForm,UserFilterForm,UserEditForm,UserViewForm)
 from django_mvc import views
+from django_mvc.actions import get_permission_resolver
 
 
 class UserEditView(views.EditView):
@@ -24,12 +25,11 @@ class UserEditView(views.EditView):
 
     @property
     def can_admin(self):
-        if self.request.user.is_superuser:
+        resolver = get_permission_resolver(self.request.user)
+        if resolver.is_superuser:
+            return True
+        elif any(resolver.in_group(g) for g in (Group.FMSB,)):
             return True
-        else:
-            user_groups = self.request.user.groups.all()
-            if any(g in user_groups for g in (Group.FMSB,)):
-                return True
 
         return False
 
@@ -1,8 +1,91 @@
 import inspect
 
 from django.dispatch import receiver
+from django.db.models.signals import post_save,post_delete
 
-from django_mvc.signals import django_inited,actions_inited
+from django_mvc.signals import django_inited,actions_inited,groups_changed
+from django_mvc.utils import hashvalue
+
+class PermissionResolver(object):
+    """
+    Load the groups and permissions of a user once, and check the permissions against the in-memory sets.
+    Use 'get_permission_resolver' to get the resolver which is cached on the user object for the whole request
+    """
+    def __init__(self,user):
+        self.user = user
+        self.is_authenticated = user.is_authenticated
+        self.is_superuser = user.is_superuser if self.is_authenticated else False
+        self.is_active = user.is_active if self.is_authenticated else False
+        self._groups = None
+        self._perms = None
+        self._fingerprint = None
+
+    def _load_groups(self):
+        if self._groups is None:
+            if self.is_authenticated:
+                groups = list(self.user.groups.values_list("pk","name"))
+            else:
+                groups = []
+            self._groups = (set(g[0] for g in groups),set(g[1] for g in groups))
+        return self._groups
+
+    @property
+    def group_pks(self):
+        return self._load_groups()[0]
+
+    @property
+    def group_names(self):
+        return self._load_groups()[1]
+
+    @property
+    def perms(self):
+        if self._perms is None:
+            self._perms = set(self.user.get_all_permissions()) if self.is_active else set()
+        return self._perms
+
+    def in_group(self,group):
+        """
+        group can be a group pk or a group name
+        """
+        if isinstance(group,int):
+            return group in self.group_pks
+        else:
+            return group in self.group_names
+
+    def has_perm(self,perm):
+        if self.is_active and self.is_superuser:
+            return True
+        return perm in self.perms
+
+    @property
+    def fingerprint(self):
+        """
+        A stable fingerprint of the user's effective permissions
+        """
+        if self._fingerprint is None:
+            if not self.is_authenticated:
+                self._fingerprint = "anonymous"
+            elif self.is_active and self.is_superuser:
+                self._fingerprint = "superuser"
+            else:
+                #group names are included because the group permissions are checked by name
+                self._fingerprint = hashvalue("{}|{}|{}".format(
+                    ",".join(str(pk) for pk in sorted(self.group_pks)),
+                    ",".join(sorted(self.group_names)),
+                    ",".join(sorted(self.perms))
+                ))
+        return self._fingerprint
+
+def get_permission_resolver(user):
+    try:
+        return user._permission_resolver
+    except AttributeError:
+        resolver = PermissionResolver(user)
+        try:
+            user._permission_resolver = resolver
+        except:
+            pass
+        return resolver
 
 class Action(object):
     """
@@ -101,14 +184,12 @@ class Action(object):
         return True;
 
     def _check_permission(self,user):
-        print("check permission:user={}, permission={}".format(user,self.permission))
-        if user.is_superuser:
+        if get_permission_resolver(user).is_superuser:
             return True
         return self.permission.check(user)
 
     def _check_any_permissions(self,user):
-        print("check permission:user={}, permission={}".format(user,self.permission))
-        if user.is_superuser:
+        if get_permission_resolver(user).is_superuser:
             return True
         for perm in self.permission:
             if perm.check(user):
@@ -155,34 +236,26 @@ class BasePermission(object):
         return False
 
 class GroupPermission(BasePermission):
+    """
+    Check whether the user is a member of the group.
+    group can be a group name, a group pk or a Group instance; only the name or pk is kept,
+    and the membership is checked against the user's groups loaded by the permission resolver, so no query is executed at import or initialization.
+    """
     def __init__(self,group):
-        self.group_not_exist = False
-        self.group = group
-
-    def initialize(self):
-        from django.contrib.auth.models import Group
-        try:
-           if isinstance(self.group,str):
-               self.group = Group.objects.get(name=self.group)
-           elif isinstance(self.group,int):
-               self.group = Group.objects.get(id=self.group)
-           elif isinstance(self.group,Group):
-               pass
-           else:
-               self.group_not_exist = True
-        except ObjectDoesNotExist as ex:
-            self.group_not_exist = True
+        if group is None or isinstance(group,(str,int)):
+            self.group = group
+        else:
+            #a group instance
+            self.group = group.name
 
     def __str__(self):
         return "User Group:{}".format(self.group)
 
     def check(self,user):
-        if self.group_not_exist:
-            return False
-        elif self.group:
-            return self.group in user.groups.all()
-        else:
+        if self.group is None:
             return True
+        else:
+            return get_permission_resolver(user).in_group(self.group)
 
 class RightPermission(BasePermission):
     def __init__(self,permission):
@@ -192,7 +265,7 @@ class RightPermission(BasePermission):
         return "Permission:{}".format(self.permission)
 
     def check(self,user):
-        return user.has_perm(self.permission)
+        return get_permission_resolver(user).has_perm(self.permission)
 
 class UsernamePermission(BasePermission):
     def __init__(self,user,casesensitive=False,exact_match=False,exclusive=False):
@@ -323,3 +396,11 @@ def initialize_actions(sender,**kwargs):
         action.initialize()
 
     actions_inited.send(sender="actions")
+
+@receiver(post_save,sender="auth.Group")
+@receiver(post_delete,sender="auth.Group")
+def invalidate_group_caches(sender,instance,**kwargs):
+    """
+    A group is created, renamed or deleted; notify the caches which depend on the group permissions
+    """
+    groups_changed.send(sender=sender,group=instance)
@@ -0,0 +1,198 @@
+"""
+A structured change audit pipeline.
+
+The changes of the model instances are recorded as ChangeEvent(model,pk,field,old,new) records,
+and dispatched to the configured sinks through a bounded in-process queue which is flushed in batches by a background thread.
+
+Configure the sinks in settings
+    CHANGE_AUDIT_SINKS = ["django_mvc.audit.LoggingSink",("django_mvc.audit.FileSink",{"path":"/var/log/audit.log"})]
+    CHANGE_AUDIT_QUEUE_SIZE = 10000
+    CHANGE_AUDIT_BATCH_SIZE = 500
+    CHANGE_AUDIT_FLUSH_INTERVAL = 1
+
+The pipeline is disabled if no sinks are configured, and the callers should check 'audit.enabled' before building the records.
+The model forms record the changed fields of the updated instances, and the saved fields of the created instances with None as the old values.
+"""
+import collections
+import logging
+import threading
+import queue
+import json
+import atexit
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.db import models,transaction
+from django.utils.module_loading import import_string
+from django.core.serializers.json import DjangoJSONEncoder
+
+from django_mvc.signals import system_ready
+
+logger = logging.getLogger(__name__)
+
+ChangeEvent = collections.namedtuple("ChangeEvent",["model","pk","field","old","new"])
+
+#True if some sinks are configured
+enabled = False
+
+_sinks = []
+_queue = None
+_worker = None
+_lock = threading.Lock()
+#the number of the events dropped because the queue is full
+dropped = 0
+
+batch_size = 500
+flush_interval = 1
+
+class LoggingSink(object):
+    """
+    Write the change events to a logger
+    """
+    def __init__(self,name="django_mvc.audit.changes",level=logging.INFO):
+        self.logger = logging.getLogger(name)
+        self.level = level
+
+    def __call__(self,events):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        for event in events:
+            self.logger.log(self.level,"%s(%s).%s: %r => %r",event.model,event.pk,event.field,event.old,event.new)
+
+class FileSink(object):
+    """
+    Append the change events to a file, one json object per line
+    """
+    def __init__(self,path):
+        self.path = path
+
+    def __call__(self,events):
+        with open(self.path,"a") as f:
+            for event in events:
+                f.write(json.dumps(event._asdict(),cls=DjangoJSONEncoder,default=str))
+                f.write("\n")
+
+class ModelSink(object):
+    """
+    Save the change events into a audit table.
+    The model should have the fields 'model','pk','field','old' and 'new', the field names can be mapped with 'field_mapping'
+    """
+    def __init__(self,model,field_mapping=None):
+        self.model = import_string(model) if isinstance(model,str) else model
+        self.field_mapping = field_mapping or {}
+
+    def __call__(self,events):
+        self.model.objects.bulk_create([
+            self.model(**dict((self.field_mapping.get(k,k),v if v is None or isinstance(v,(str,int,float,bool)) else str(v)) for k,v in event._asdict().items())) for event in events
+        ])
+
+def register_sink(sink):
+    """
+    Add a sink which is a callable object accepting a list of ChangeEvent
+    """
+    global enabled
+    with _lock:
+        _sinks.append(sink)
+        enabled = True
+
+def unregister_sink(sink):
+    global enabled
+    with _lock:
+        _sinks.remove(sink)
+        enabled = True if _sinks else False
+
+def _flush(events):
+    for sink in list(_sinks):
+        try:
+            sink(events)
+        except:
+            logger.exception("Failed to write change events to sink %s",sink)
+
+def _run():
+    while True:
+        try:
+            events = [_queue.get(timeout=flush_interval)]
+        except queue.Empty:
+            continue
+        try:
+            while len(events) < batch_size:
+                events.append(_queue.get_nowait())
+        except queue.Empty:
+            pass
+        _flush(events)
+        for i in range(len(events)):
+            _queue.task_done()
+
+def _start():
+    global _queue,_worker
+    with _lock:
+        if _worker is None:
+            _queue = queue.Queue(maxsize=getattr(settings,"CHANGE_AUDIT_QUEUE_SIZE",10000))
+            _worker = threading.Thread(target=_run,name="change-audit",daemon=True)
+            _worker.start()
+
+def flush():
+    """
+    Block until all queued events are written to the sinks
+    """
+    if _queue is not None:
+        _queue.join()
+
+def emit(events):
+    """
+    Queue the change events; the events are dropped if the queue is full.
+    """
+    global dropped
+    if not enabled or not events:
+        return
+    if _worker is None:
+        _start()
+    for event in events:
+        try:
+            _queue.put_nowait(event)
+        except queue.Full:
+            dropped += 1
+
+def _value(value):
+    """
+    Convert the model instances and querysets to pks, because the events are processed after the data is saved
+    """
+    if isinstance(value,models.Model):
+        return value.pk
+    elif isinstance(value,models.manager.BaseManager):
+        return [o.pk for o in value.all()]
+    elif isinstance(value,(models.query.QuerySet,list,tuple)):
+        return [_value(o) for o in value]
+    else:
+        return value
+
+def get_events(instance,changes):
+    """
+    Return the change events of a model instance
+    changes: a dict of field name to (old value,new value)
+    """
+    model = instance.__class__._meta.label
+    return [ChangeEvent(model,instance.pk,name,_value(old),_value(new)) for name,(old,new) in changes.items()]
+
+def record(events):
+    """
+    Queue the change events after the current transaction is committed; the events are discarded if the transaction is rolled back.
+    Build the events with 'get_events' before the instance is saved, because the old values of the m2m fields are lazy querysets
+    """
+    if not enabled or not events:
+        return
+    transaction.on_commit(lambda:emit(events))
+
+atexit.register(flush)
+
+@receiver(system_ready)
+def init_audit(sender,**kwargs):
+    global batch_size,flush_interval
+    batch_size = getattr(settings,"CHANGE_AUDIT_BATCH_SIZE",batch_size)
+    flush_interval = getattr(settings,"CHANGE_AUDIT_FLUSH_INTERVAL",flush_interval)
+    for sink in getattr(settings,"CHANGE_AUDIT_SINKS",None) or []:
+        if isinstance(sink,(list,tuple)):
+            sink_class,sink_kwargs = sink
+        else:
+            sink_class,sink_kwargs = sink,{}
+        register_sink(import_string(sink_class)(**sink_kwargs) if isinstance(sink_class,str) else sink_class(**sink_kwargs))
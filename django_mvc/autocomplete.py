@@ -0,0 +1,141 @@
+"""
+A server-side autocomplete view for the model choice fields whose widget is created by AutocompleteWidgetFactory.
+
+The widget only renders the selected options, and the shared initialiser fetches the other options from the view page by page.
+The fields are registered by the forms at startup; include the urlpatterns in the project's urls
+    path("",include(django_mvc.autocomplete.urlpatterns))
+
+request parameters:
+    term: the search text
+    page: the page number, start from 1
+response: {"results":[{"id":value,"text":label}],"pagination":{"more":true/false}}
+
+The user must have the permission of the widget(see AutocompleteMixin.permission);
+if the widget doesn't declare a permission, the user must have the add, change or view permission of the model of the form which registered the field.
+
+settings:
+    MVC_AUTOCOMPLETE_ANONYMOUS: allow the anonymous users to use the autocomplete view, default is False
+"""
+from django.conf import settings
+from django.contrib.auth import get_permission_codename
+from django.db import models
+from django.db.models import Q
+from django.http import Http404,HttpResponseForbidden,JsonResponse
+from django.urls import path
+from django.views import View
+
+from django_mvc.actions import get_permission_resolver,RightPermission
+from django_mvc.utils import hashvalue
+
+#the registered fields. key is the field id, value is (form class,form field)
+_fields = {}
+
+def get_field_id(form_class,name):
+    return hashvalue("{}.{}.{}".format(form_class.__module__,form_class.__name__,name))[:16]
+
+def register(form_class,name,field):
+    """
+    Register a model choice field with a autocomplete widget
+    """
+    if field.widget.autocomplete_id:
+        #the field is shared by other form classes and was registered
+        return
+    field_id = get_field_id(form_class,name)
+    _fields[field_id] = (form_class,field)
+    field.widget.autocomplete_id = field_id
+
+def get_search_fields(model):
+    """
+    Return the default search fields of the model: the text fields in the model's ordering,
+    otherwise the unique or indexed text fields, otherwise the first text field
+    """
+    text_fields = [f for f in model._meta.concrete_fields if isinstance(f,(models.CharField,models.TextField)) and not f.choices]
+    names = [f.name for f in text_fields]
+    search_fields = [o.lstrip("-") for o in (model._meta.ordering or []) if isinstance(o,str) and o.lstrip("-") in names]
+    if not search_fields:
+        search_fields = [f.name for f in text_fields if f.unique or f.db_index]
+    if not search_fields and text_fields:
+        search_fields = [text_fields[0].name]
+    return search_fields
+
+def has_permission(form_class,field,user):
+    """
+    Return True if the user can search the choices of the field
+    """
+    resolver = get_permission_resolver(user)
+    if resolver.is_active and resolver.is_superuser:
+        return True
+    permission = field.widget.permission
+    if permission:
+        if isinstance(permission,str):
+            permission = [permission]
+        if isinstance(permission,(list,tuple)):
+            return any((RightPermission(perm) if isinstance(perm,str) else perm).check(user) for perm in permission)
+        return permission.check(user)
+
+    meta = getattr(form_class,"_meta",None)
+    model = getattr(meta,"model",None)
+    if not model:
+        #not a model form, only the authentication is required
+        return True
+    opts = model._meta
+    return any(resolver.has_perm("{}.{}".format(opts.app_label,get_permission_codename(action,opts))) for action in ("add","change","view"))
+
+def search(field,term,page=1):
+    """
+    Return (the choices of the page,has more pages)
+    """
+    from .forms import choices
+    widget = field.widget
+    mode = getattr(field,"limit_choices_mode",None)
+    if mode == choices.LIMIT_PER_CLASS:
+        #the limit_choices_to was applied to the field's queryset
+        queryset = field.queryset
+    else:
+        queryset = field.base_queryset if mode else field.queryset
+        limit_choices_to = field.get_limit_choices_to()
+        if limit_choices_to is not None:
+            queryset = queryset.complex_filter(limit_choices_to)
+
+    search_fields = widget.search_fields or get_search_fields(queryset.model)
+    if term:
+        qfilter = None
+        for f in search_fields:
+            if qfilter is None:
+                qfilter = Q(**{"{}__{}".format(f,widget.lookup):term})
+            else:
+                qfilter |= Q(**{"{}__{}".format(f,widget.lookup):term})
+        if qfilter is None:
+            return ([],False)
+        queryset = queryset.filter(qfilter)
+    if not queryset.ordered:
+        queryset = queryset.order_by(*(search_fields[:1] + ["pk"]))
+
+    start = (page - 1) * widget.page_size
+    objs = list(queryset[start:start + widget.page_size + 1])
+    return (
+        [{"id":field.prepare_value(o),"text":str(field.label_from_instance(o))} for o in objs[:widget.page_size]],
+        len(objs) > widget.page_size
+    )
+
+class AutocompleteView(View):
+    def get(self,request,field_id):
+        registered = _fields.get(field_id)
+        if not registered:
+            raise Http404("Autocomplete field '{}' doesn't exist".format(field_id))
+        form_class,field = registered
+        if not request.user.is_authenticated:
+            if not getattr(settings,"MVC_AUTOCOMPLETE_ANONYMOUS",False):
+                return HttpResponseForbidden()
+        elif not has_permission(form_class,field,request.user):
+            return HttpResponseForbidden()
+        try:
+            page = max(int(request.GET.get("page") or 1),1)
+        except:
+            page = 1
+        results,more = search(field,(request.GET.get("term") or "").strip(),page)
+        return JsonResponse({"results":results,"pagination":{"more":more}})
+
+urlpatterns = [
+    path("mvc/autocomplete/<str:field_id>/",AutocompleteView.as_view(),name="mvc_autocomplete")
+]
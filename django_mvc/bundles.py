@@ -0,0 +1,205 @@
+"""
+Content-hashed static bundles for the html media of the views.
+
+The css files, js files and the inline statements of a view's media are combined into two bundle files
+whose names are the hash of the content, so the bundles can be served as static files with far-future cache headers.
+The relative urls in the css files are rewritten to absolute static urls, because the bundles are served from another folder.
+The bundles are built by the management command 'build_media_bundles', and registered at 'system_ready' by the views.
+
+settings:
+    MVC_MEDIA_BUNDLES: False: disabled(default); True: use the bundles built by the management command; "auto": build the missing bundles at startup
+    MVC_MEDIA_BUNDLE_ROOT: the folder to save the bundle files, default is "[STATIC_ROOT]/bundles"
+    MVC_MEDIA_BUNDLE_URL: the url of the bundle folder, default is "[STATIC_URL]bundles/"
+"""
+import os
+import re
+import logging
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.utils.html import format_html
+from django.dispatch import receiver
+
+from .forms.utils import Media
+from .utils import hashvalue
+from .signals import system_ready
+
+logger = logging.getLogger(__name__)
+
+#the registered bundles. key is the media key used by the view, value is the bundled media
+_bundles = {}
+
+def is_enabled():
+    return getattr(settings,"MVC_MEDIA_BUNDLES",False)
+
+def get_bundle_root():
+    return getattr(settings,"MVC_MEDIA_BUNDLE_ROOT",None) or os.path.join(settings.STATIC_ROOT or ".","bundles")
+
+def get_bundle_url():
+    return getattr(settings,"MVC_MEDIA_BUNDLE_URL",None) or "{}bundles/".format(settings.STATIC_URL or "/static/")
+
+def is_external(path):
+    return path.startswith(("http://","https://","//"))
+
+def read_static_file(path):
+    """
+    Return the content of a local static file; return None if not found
+    """
+    static_url = settings.STATIC_URL or "/static/"
+    if path.startswith(static_url):
+        path = path[len(static_url):]
+    elif path.startswith("/static/"):
+        path = path[len("/static/"):]
+    filename = finders.find(path.lstrip("/"))
+    if not filename:
+        return None
+    with open(filename,encoding="utf-8") as f:
+        return f.read()
+
+class BundledMedia(Media):
+    """
+    A media which only renders the link and script tags of the bundles and the external files which can't be bundled.
+    """
+    def __init__(self,css_bundle=None,js_bundle=None,external_css=None,external_js=None):
+        super(BundledMedia,self).__init__(css={"all":external_css} if external_css else None,js=external_js)
+        self.css_bundle = css_bundle
+        self.js_bundle = js_bundle
+
+    def render_css(self):
+        tags = list(super(BundledMedia,self).render_css())
+        if self.css_bundle:
+            tags.append(format_html('<link href="{}" type="text/css" media="all" rel="stylesheet">',"{}{}".format(get_bundle_url(),self.css_bundle)))
+        return tags
+
+    def render_js(self):
+        tags = list(super(BundledMedia,self).render_js())
+        if self.js_bundle:
+            tags.append(format_html('<script type="text/javascript" src="{}"></script>',"{}{}".format(get_bundle_url(),self.js_bundle)))
+        return tags
+
+    def render_statements(self):
+        return []
+
+css_url_re = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+def get_static_url(path):
+    """
+    Return the absolute url of a static file path
+    """
+    if path.startswith("/"):
+        return path
+    return "{}{}".format(settings.STATIC_URL or "/static/",path)
+
+def rewrite_css_urls(content,path):
+    """
+    Rewrite the relative urls in the css file to absolute urls, because the bundle is served from a different folder
+    """
+    base_url = get_static_url(path)
+    def _rewrite(m):
+        url = m.group(2).strip()
+        if is_external(url) or url.startswith(("/","data:","#")):
+            return m.group(0)
+        return "url({0}{1}{0})".format(m.group(1),urljoin(base_url,url))
+    return css_url_re.sub(_rewrite,content)
+
+def _bundle_content(files,statements=None,css=False):
+    """
+    Return (content,external files)
+    css: if True, the relative urls in the files are rewritten to absolute urls
+    """
+    contents = []
+    externals = []
+    for path in files:
+        if is_external(path):
+            externals.append(path)
+            continue
+        content = read_static_file(path)
+        if content is None:
+            raise Exception("Static file '{}' is not found".format(path))
+        if css:
+            content = rewrite_css_urls(content,path)
+        contents.append("/* {} */\n{}".format(path,content))
+    if statements:
+        for statement in statements:
+            contents.append(str(statement))
+    return ("\n;\n".join(contents) if contents else None,externals)
+
+def build(media,write=True):
+    """
+    Build the bundles for the media and return a BundledMedia.
+    write: write the missing bundle files if True; otherwise raise exception if the bundle file doesn't exist
+    """
+    css_files = []
+    for medium in sorted(media._css.keys()):
+        if medium != "all":
+            #only bundle the css files for all media
+            raise Exception("Can't bundle the css files for media '{}'".format(medium))
+        css_files.extend(media._css[medium])
+    css_content,external_css = _bundle_content(css_files,css=True)
+    js_content,external_js = _bundle_content(media._js,media._statements if hasattr(media,"_statements") else None)
+
+    bundle_root = get_bundle_root()
+    names = []
+    for content,ext in ((css_content,"css"),(js_content,"js")):
+        if content is None:
+            names.append(None)
+            continue
+        name = "{}.{}".format(hashvalue(content)[:16],ext)
+        filename = os.path.join(bundle_root,name)
+        if not os.path.exists(filename):
+            if not write:
+                raise Exception("The bundle file '{}' doesn't exist, please run the management command 'build_media_bundles'".format(filename))
+            if not os.path.exists(bundle_root):
+                os.makedirs(bundle_root)
+            tmp_filename = "{}.{}".format(filename,os.getpid())
+            with open(tmp_filename,"w",encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_filename,filename)
+        names.append(name)
+
+    return BundledMedia(css_bundle=names[0],js_bundle=names[1],external_css=external_css,external_js=external_js)
+
+def register(key,media,write=False):
+    """
+    Build or find the bundle for the media, and register it with the key.
+    Return the bundled media; return None if failed
+    """
+    try:
+        _bundles[key] = build(media,write=write)
+        return _bundles[key]
+    except Exception as ex:
+        logger.warning("Failed to bundle the media for %s. %s",key,ex)
+        return None
+
+def get(key):
+    return _bundles.get(key)
+
+def register_views(viewclasses,write=False):
+    """
+    Register the bundles for the view classes which support html media
+    Return the number of the registered bundles
+    """
+    from .views.views import HtmlMediaMixin
+    count = 0
+    for cls in viewclasses:
+        if not issubclass(cls,HtmlMediaMixin) or not getattr(cls,"model",None):
+            continue
+        try:
+            mediaforms = cls().get_mediaforms()
+        except Exception as ex:
+            logger.warning("Failed to get the media forms of view %s.%s. %s",cls.__module__,cls.__name__,ex)
+            continue
+        if mediaforms in _bundles:
+            continue
+        if register(mediaforms,cls.combine_media(mediaforms),write=write):
+            count += 1
+    return count
+
+@receiver(system_ready)
+def init_bundles(sender,**kwargs):
+    if not is_enabled():
+        return
+    from .views.views import _viewclasses
+    count = register_views(_viewclasses,write=is_enabled() == "auto")
+    logger.info("%s media bundles are registered",count)
@@ -0,0 +1,84 @@
+"""
+Per model generation counters stored in the django cache.
+
+The generation of a model is bumped whenever a instance of the model is saved or deleted, or a many to many relationship of the model is changed.
+A cache key which includes the generations of the models it depends on is automatically invalidated across processes when any of these models is changed.
+Only the models registered through 'register_model' are tracked.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_save,post_delete,m2m_changed
+from django.dispatch import receiver
+
+from django_mvc.actions import get_permission_resolver
+from django_mvc.signals import groups_changed
+
+_tracked_models = set()
+
+def get_cache():
+    return caches[getattr(settings,"MVC_CACHE","default")]
+
+def _generation_key(model):
+    return "mvc_generation_{}".format(model._meta.label_lower)
+
+def register_model(model):
+    """
+    Track the changes of the model
+    """
+    _tracked_models.add(model)
+
+def get_generations(models):
+    """
+    Return a string which includes the current generations of the models
+    """
+    cache = get_cache()
+    keys = [_generation_key(m) for m in models]
+    generations = cache.get_many(keys)
+    missing = [k for k in keys if k not in generations]
+    for k in missing:
+        #initialize the generation; use add to avoid overriding the generation set by other processes.
+        cache.add(k,1,None)
+    if missing:
+        generations.update(cache.get_many(missing))
+    return ",".join(str(generations.get(k,0)) for k in keys)
+
+def bump_generation(model):
+    cache = get_cache()
+    key = _generation_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        #the key doesn't exist
+        cache.add(key,1,None)
+
+def models_changed(*models):
+    """
+    Bump the generations of the tracked models.
+    Called explicitly if the models are changed without sending the model signals, for example by QuerySet.update or a raw delete
+    """
+    for m in models:
+        if m in _tracked_models:
+            bump_generation(m)
+
+@receiver(post_save)
+@receiver(post_delete)
+def _model_changed(sender,**kwargs):
+    models_changed(sender)
+
+@receiver(m2m_changed)
+def _m2m_changed(sender,instance,action,model,**kwargs):
+    if not action.startswith("post_"):
+        return
+    models_changed(instance.__class__,model,sender)
+
+@receiver(groups_changed)
+def _groups_changed(sender,**kwargs):
+    #the group permissions of all tracked models may be changed.
+    for model in list(_tracked_models):
+        bump_generation(model)
+
+def get_permission_fingerprint(user):
+    """
+    Return a fingerprint of the user's effective permissions
+    """
+    return get_permission_resolver(user).fingerprint
@@ -1,7 +1,7 @@
 from . import fields
 from . import widgets
 from .boundfield import (get_boundfielditerator,)
-from .forms import (EditableFieldsMixin,ModelForm,RequestUrlMixin,Form,FormTemplateMixin)
+from .forms import (EditableFieldsMixin,ModelForm,RequestUrlMixin,Form,FormTemplateMixin,ConcurrentUpdateError)
 from .filterform import (FilterForm,)
 from .listform import (ListForm,ListMemberForm,InnerListFormTableTemplateMixin,InnerListFormULTemplateMixin,ConfirmMixin)
 from django.forms import ValidationError
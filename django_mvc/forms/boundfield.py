@@ -10,6 +10,7 @@ from django.utils import safestring
 
 from . import widgets
 from . import fields
+from . import choices
 
 iterator_map = {}
 def get_boundfielditerator(form,fields=None):
@@ -235,6 +236,11 @@ class BoundField(forms.boundfield.BoundField):
         """
         if self.is_hidden:
             attrs = {'style':'display:none'}
+        facet_counts = self.form.facet_counts.get(self.name) if getattr(self.form,"facet_counts",None) else None
+        if facet_counts is not None and not only_initial:
+            widget = widgets.FacetCountsWidget.wrap(widget or self.field.widget,facet_counts)
+        else:
+            widget = choices.CachedSelect.wrap(widget or self.field.widget)
         html = super(BoundField,self).as_widget(widget,attrs,only_initial)
         if not self.is_display and self.name in self.form.errors:
             html =  "<div style=\"display:inline\"><table class=\"error\" style=\"width:100%;\"><tr><td class=\"error\">{}<div class=\"text-error\" style=\"margin:0px\"><i class=\"icon-warning-sign\"></i> {}</div></td></tr></table></div>".format(html,"<br>".join(self.form.errors[self.name]))
@@ -456,6 +462,7 @@ class FormSetBoundField(BoundField):
             prefix=self.name,
             parent_instance=self.form.instance,
             check=self.form.check,
+            readonly=self.field.is_display,
             request=self.form.request,
             requesturl=self.form.requesturl
         )
@@ -473,7 +480,7 @@ class FormSetBoundField(BoundField):
 
     def full_clean(self):
         if self.formset.is_valid():
-            return [form.cleaned_data for form in self.formset]
+            return [form.cleaned_data for form in self.formset.submitted_forms]
         else:
            raise ValidationError("") #error placeholder, but not display in page
 
@@ -489,23 +496,7 @@ class FormSetBoundField(BoundField):
     @property
     def is_changed(self):
         if self._is_changed is None:
-            try:
-                changed = False
-                for form in self.formset:
-                    if form.can_delete:
-                        if form.instance.pk:
-                            changed = True
-                            break
-                    elif form.is_changed:
-                        changed = True
-                        break
-                self._is_changed = changed
-            finally:
-                pass
-                for form in self.formset:
-                    if form.can_delete:
-                        if form.instance.pk:
-                            print("Delete {}({})".format(form.instance.__class__.__name__,form.instance.pk))
+            self._is_changed = self.formset.is_changed
         return self._is_changed
 
 
@@ -513,7 +504,7 @@ class FormSetBoundField(BoundField):
         if not self.is_changed:
             return
 
-        for form in self.formset:
+        for form in self.formset.submitted_forms:
             if form.can_delete:
                 if form.instance.pk:
                     form.instance.delete()
@@ -564,6 +555,33 @@ class ListBoundFieldMixin(object):
     def __init__(self, form, field, name):
         super(ListBoundFieldMixin,self).__init__(form,field,name)
         self.sortable = name in self.form._meta.sortable_fields if self.form._meta.sortable_fields else False
+        #render the whole column of the page through the widget's render_many if the field is a plain display field
+        self.render_column = (
+            hasattr(self.form,"get_column_html") and
+            isinstance(self.field.widget,widgets.DisplayWidget) and
+            not hasattr(self,"set_data") and
+            getattr(super(ListBoundFieldMixin,self).as_widget,"__func__",None) is BoundField.as_widget
+        )
+
+    def as_widget(self, widget=None, attrs=None, only_initial=False):
+        if self.render_column and widget is None and attrs is None and not only_initial:
+            column = self.form.get_column_html(self.name)
+            if column is not None:
+                return column[self.form.index]
+        return super(ListBoundFieldMixin,self).as_widget(widget,attrs,only_initial)
+
+    def render_many(self):
+        """
+        Render the column of the current page of the list form
+        """
+        values = []
+        index = self.form.index
+        try:
+            for self.form.index in range(len(self.form)):
+                values.append(self.value())
+        finally:
+            self.form.index = index
+        return self.field.widget.render_many(self.html_name,values,renderer=self.form.renderer)
 
     @property
     def sorting(self):
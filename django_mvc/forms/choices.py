@@ -0,0 +1,389 @@
+"""
+A shared cache of the choices of the model choice fields.
+
+The choices of a model choice field are evaluated once per request for each distinct (queryset sql, label function),
+and shared by all the forms rendered in the request, for example the rows of a formset and the filter forms.
+The options html of a plain select widget is also rendered once per request, and the selected option is spliced in for each rendering.
+The posted values of the model choice fields in a formset are loaded with one query for all the submitted rows.
+The cached choices of a model are discarded when a instance of the model is saved or deleted in the request.
+
+The limit_choices_to of a model choice field is applied to the shared queryset of the field
+    a dict or Q object: once per form class
+    a callable: once per request
+    a callable marked by 'limit_choices_per_instance': once per form instance, for the callables depending on the request or instance state
+
+settings:
+    MVC_CHOICE_CACHE: cache the choices in the request, default is True
+    MVC_CHOICE_CACHE_TIMEOUT: the seconds to cache the choices across requests, default is 0(disabled);
+        the cached choices are invalidated by the generation of the choice model, see django_mvc.cache.
+        the generation of the related models used by the label function is not checked.
+"""
+import threading
+import types
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet,ValidationError
+from django.core.signals import request_started,request_finished
+from django.db.models.signals import post_save,post_delete
+from django.dispatch import receiver
+from django.utils.html import conditional_escape,escape,mark_safe
+
+from django_mvc import cache as mvc_cache
+from .utils import hashvalue
+
+_local = threading.local()
+
+def is_enabled():
+    return getattr(settings,"MVC_CHOICE_CACHE",True)
+
+def get_timeout():
+    return getattr(settings,"MVC_CHOICE_CACHE_TIMEOUT",0)
+
+def _get_store():
+    """
+    Return the choice cache of the current request; return None if not in a request or disabled
+    """
+    return getattr(_local,"store",None)
+
+def _class_path(obj):
+    obj = getattr(obj,"__func__",obj)
+    return "{}.{}".format(getattr(obj,"__module__",""),getattr(obj,"__qualname__",None) or getattr(obj,"__name__",""))
+
+def _get_key(iterator):
+    """
+    Return the key of the choices in the request cache; raise EmptyResultSet if the queryset matches nothing
+    """
+    field = iterator.field
+    queryset = iterator.queryset
+    label_func = field.label_from_instance
+    return (queryset.model,queryset.db,str(queryset.query),type(iterator),type(field),getattr(label_func,"__func__",label_func),field.to_field_name)
+
+def get_choices(iterator):
+    """
+    Return the cached list of choices of the model choice iterator, excluding the empty choice.
+    Return None if the choices are not cached.
+    """
+    store = _get_store()
+    if store is None:
+        return None
+    try:
+        key = _get_key(iterator)
+    except EmptyResultSet:
+        return []
+
+    choices = store.get(key)
+    if choices is not None:
+        return choices
+
+    cache = mvc_cache.get_cache() if iterator.shareable and get_timeout() else None
+    cache_key = None
+    if cache:
+        model,db,sql,iterator_class,field_class,label_func,to_field_name = key
+        cache_key = "mvc_choices_{}".format(hashvalue("{}|{}|{}|{}|{}|{}|{}|{}".format(
+            model._meta.label_lower,db,sql,_class_path(iterator_class),_class_path(field_class),_class_path(label_func),to_field_name,
+            mvc_cache.get_generations([model])
+        )))
+        choices = cache.get(cache_key)
+
+    if choices is None:
+        choices = list(iterator.evaluate())
+        if cache_key:
+            cache.set(cache_key,choices,get_timeout())
+
+    store[key] = choices
+    return choices
+
+def get_options(widget):
+    """
+    Return a tuple(options html,the positions to insert the selected attribute);
+    return None if the choices of the widget are not cached
+    """
+    store = _get_store()
+    if store is None:
+        return None
+    iterator = widget.choices
+    try:
+        choices_key = _get_key(iterator)
+    except EmptyResultSet:
+        return None
+    key = (choices_key[0],"options",choices_key,iterator.field.empty_label)
+
+    options = store.get(key)
+    if options is not None:
+        return options
+
+    htmls = []
+    positions = {}
+    length = 0
+    for value,label in iterator:
+        value = "" if value is None else str(value)
+        html = '\n  <option value="{}"'.format(escape(value))
+        if value not in positions:
+            positions[value] = length + len(html)
+        html = '{}>{}</option>'.format(html,conditional_escape(label))
+        htmls.append(html)
+        length += len(html)
+    options = ("".join(htmls),positions)
+    store[key] = options
+    return options
+
+def _get_objects_key(field):
+    queryset = field.queryset
+    return (queryset.model,"objects",id(field),queryset.db,str(queryset.query))
+
+def prefetch(field,values):
+    """
+    Load the model instances of the posted values of a model choice field with one query,
+    then the field gets the instances from the request cache when cleaning the values
+    """
+    store = _get_store()
+    if store is None:
+        return
+    values = set(str(v) for v in values if v not in field.empty_values)
+    if not values:
+        return
+    key = field.to_field_name or "pk"
+    try:
+        objects_key = _get_objects_key(field)
+        objs = dict((str(getattr(o,key)),o) for o in field.queryset.filter(**{"{}__in".format(key):values}))
+    except (EmptyResultSet,ValueError,TypeError,ValidationError):
+        #some values are invalid, clean the values one by one
+        return
+    cached = store.get(objects_key)
+    if cached:
+        cached[0].update(objs)
+        cached[1].update(values)
+    else:
+        store[objects_key] = (objs,values)
+
+def get_selected_objects(field,queryset,values):
+    """
+    Return the model instances of the selected values of a model choice field in the order of the values.
+    The instances are cached in the request, so a selected value is loaded once per request for the same queryset
+    """
+    key = field.to_field_name or "pk"
+    values = [str(v) for v in values]
+    store = _get_store()
+    if store is None:
+        return list(queryset.filter(**{"{}__in".format(key):values}))
+    try:
+        objects_key = (queryset.model,"selected",queryset.db,str(queryset.query),key)
+    except EmptyResultSet:
+        return []
+    objs,loaded = store.get(objects_key) or ({},set())
+    missing = [v for v in values if v not in loaded]
+    if missing:
+        objs.update((str(getattr(o,key)),o) for o in queryset.filter(**{"{}__in".format(key):missing}))
+        loaded.update(missing)
+        store[objects_key] = (objs,loaded)
+    return [objs[v] for v in values if v in objs]
+
+def _to_python(self,value):
+    """
+    The to_python of ModelChoiceField which uses the instances loaded by 'prefetch'
+    """
+    if value in self.empty_values:
+        return None
+    store = _get_store()
+    if store:
+        try:
+            objs,values = store.get(_get_objects_key(self)) or (None,None)
+        except EmptyResultSet:
+            objs = None
+        if objs is not None and str(value) in values:
+            try:
+                return objs[str(value)]
+            except KeyError:
+                raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+    return forms.ModelChoiceField.to_python(self,value)
+
+#where the limit_choices_to of a model choice field is applied
+LIMIT_PER_CLASS = "class"
+LIMIT_PER_REQUEST = "request"
+LIMIT_PER_INSTANCE = "instance"
+
+def limit_choices_per_instance(func):
+    """
+    Mark a limit_choices_to callable which is evaluated for every form instance
+    """
+    func.per_instance = True
+    return func
+
+def prepare_limit_choices_to(field):
+    """
+    Decide where the limit_choices_to of the field is applied, and apply the static limit_choices_to to the field's queryset.
+    Return the mode, or None if the field has no limit_choices_to
+    """
+    if hasattr(field,"limit_choices_mode"):
+        #the field is shared by other form classes and was prepared
+        return field.limit_choices_mode
+    if getattr(field,"queryset",None) is None or not hasattr(field,"get_limit_choices_to"):
+        mode = None
+    elif type(field).get_limit_choices_to is not forms.ModelChoiceField.get_limit_choices_to:
+        mode = LIMIT_PER_INSTANCE
+    elif field.limit_choices_to is None:
+        mode = None
+    elif not callable(field.limit_choices_to):
+        mode = LIMIT_PER_CLASS
+    elif getattr(field.limit_choices_to,"per_instance",False):
+        mode = LIMIT_PER_INSTANCE
+    else:
+        mode = LIMIT_PER_REQUEST
+
+    if mode == LIMIT_PER_CLASS:
+        field.queryset = field.queryset.complex_filter(field.limit_choices_to)
+    elif mode:
+        #the queryset without the limit_choices_to
+        field.base_queryset = field.queryset
+    field.limit_choices_mode = mode
+    return mode
+
+def apply_limit_choices_to(field):
+    """
+    Apply the limit_choices_to of the field for a form instance
+    """
+    if not hasattr(field,"limit_choices_mode"):
+        #the field is not prepared by the form class
+        forms.models.apply_limit_choices_to_to_formfield(field)
+        return
+    mode = field.limit_choices_mode
+    if mode not in (LIMIT_PER_REQUEST,LIMIT_PER_INSTANCE):
+        return
+    store = _get_store() if mode == LIMIT_PER_REQUEST else None
+    key = (field.base_queryset.model,"limit_choices_to",id(field))
+    queryset = store.get(key) if store is not None else None
+    if queryset is None:
+        limit_choices_to = field.get_limit_choices_to()
+        queryset = field.base_queryset if limit_choices_to is None else field.base_queryset.complex_filter(limit_choices_to)
+        if store is not None:
+            store[key] = queryset
+    field.queryset = queryset
+
+class CachedModelChoiceIterator(forms.models.ModelChoiceIterator):
+    """
+    A model choice iterator which gets the choices from the choice cache
+    """
+    #the choices can be cached across requests if they only contain the values and labels
+    shareable = True
+
+    def evaluate(self):
+        queryset = self.queryset
+        # Can't use iterator() when queryset uses prefetch_related()
+        if not queryset._prefetch_related_lookups:
+            queryset = queryset.iterator()
+        for obj in queryset:
+            yield self.choice(obj)
+
+    def empty_choice(self):
+        return ("",self.field.empty_label)
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield self.empty_choice()
+        choices = get_choices(self)
+        if choices is None:
+            choices = self.evaluate()
+        for choice in choices:
+            yield choice
+
+    def __len__(self):
+        choices = get_choices(self)
+        if choices is None:
+            return super().__len__()
+        return len(choices) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        if self.field.empty_label is not None:
+            return True
+        choices = get_choices(self)
+        if choices is None:
+            return super().__bool__()
+        return True if choices else False
+
+class CachedSelect(object):
+    """
+    A proxy of a select widget which renders the select with the cached options html.
+    The proxy is created for each rendering, because the widget is shared by all form instances
+    """
+    def __init__(self,widget):
+        self.widget = widget
+
+    @classmethod
+    def wrap(cls,widget):
+        #only the single select widgets rendered by the django templates are supported
+        if (
+            _get_store() is not None and
+            isinstance(widget,forms.Select) and
+            not widget.allow_multiple_selected and
+            not widget.option_inherits_attrs and
+            type(widget).render is forms.Widget.render and
+            type(widget).get_context is forms.Select.get_context and
+            type(widget).optgroups is forms.ChoiceWidget.optgroups and
+            type(widget).create_option is forms.ChoiceWidget.create_option and
+            widget.template_name == forms.Select.template_name and
+            widget.option_template_name == forms.Select.option_template_name and
+            isinstance(widget.choices,CachedModelChoiceIterator) and
+            type(widget.choices).empty_choice is CachedModelChoiceIterator.empty_choice and
+            type(widget.choices).choice is forms.models.ModelChoiceIterator.choice
+        ):
+            return cls(widget)
+        else:
+            return widget
+
+    def __getattr__(self,name):
+        return getattr(self.widget,name)
+
+    def render(self,name,value,attrs=None,renderer=None):
+        options = get_options(self.widget)
+        if options is None:
+            return self.widget.render(name,value,attrs=attrs,renderer=renderer)
+        html,positions = options
+        selected = [positions[v] for v in self.widget.format_value(value) if v in positions]
+        if selected:
+            position = min(selected)
+            html = "{} selected{}".format(html[:position],html[position:])
+
+        attrs = self.widget.build_attrs(self.widget.attrs,attrs)
+        attrs = "".join(" {}".format(escape(k)) if v is True else ' {}="{}"'.format(escape(k),escape(str(v))) for k,v in attrs.items() if v is not False)
+        return mark_safe('<select name="{}"{}>{}\n</select>'.format(escape(name),attrs,html))
+
+def install(field):
+    """
+    Use the cached choice iterator for a model choice field
+    """
+    if not isinstance(field,forms.ModelChoiceField) or field.queryset is None:
+        return
+    if field.iterator is forms.models.ModelChoiceIterator:
+        field.iterator = CachedModelChoiceIterator
+        field.widget.choices = field.choices
+    if type(field).to_python is forms.ModelChoiceField.to_python:
+        field.to_python = types.MethodType(_to_python,field)
+    if issubclass(field.iterator,CachedModelChoiceIterator) and field.iterator.shareable and get_timeout():
+        #track the changes of the choice model to invalidate the choices cached across requests
+        mvc_cache.register_model(field.queryset.model)
+
+@receiver(request_started)
+def _request_started(sender,**kwargs):
+    _local.store = {} if is_enabled() else None
+
+@receiver(request_finished)
+def _request_finished(sender,**kwargs):
+    _local.store = None
+
+def model_changed(model):
+    """
+    Discard the cached choices of the model in the current request.
+    Called explicitly if the model is changed without sending the model signals, for example by QuerySet.update or a raw delete
+    """
+    store = _get_store()
+    if not store:
+        return
+    #the first item of the key is the choice model
+    for key in [k for k in store if k[0] is model]:
+        del store[key]
+
+@receiver(post_save)
+@receiver(post_delete)
+def _model_changed(sender,**kwargs):
+    model_changed(sender)
@@ -8,6 +8,7 @@ from django_mvc.signals import actions_inited,fields_inited
 from django_mvc.utils import ConditionalChoice,getallargs,getclassmethodargs
 from .. import widgets
 from ..utils import hashvalue,JSONEncoder
+from ..choices import CachedModelChoiceIterator
 from .coerces import *
 from .. import boundfield
 
@@ -206,7 +207,6 @@ def CompoundFieldFactory(compoundfield_class,model,field_name,related_field_name
         class_name = "{}_{}".format(field_class.__name__,class_id)
         base_boundfield_class = field_class.boundfield_class if hasattr(field_class,"boundfield_class") and getattr(field_class,"boundfield_class") else boundfield.BoundField
         kwargs.update({"field_name":field_name,"related_field_names":related_field_names,"hidden_layout":hidden_layout,"boundfield_class":boundfield.get_compoundboundfield(base_boundfield_class)})
-        print(kwargs["boundfield_class"])
         if "field_params" in kwargs:
             field_params = kwargs["field_params"]
             field_kwargs,extra_fields = init_field_params(field_class,field_params)
@@ -276,6 +276,7 @@ class SwitchField(CompoundField):
     off_layout = None
     edit_layout = None
     true_value = 'True'
+    media = widgets.widgets_media
 
     @classmethod
     def init_kwargs(cls,model,field_name,related_field_names,kwargs):
@@ -321,38 +322,19 @@ class SwitchField(CompoundField):
         val1 = f.value()
         val1_str = str(val1) if val1 is not None else ""
             
-        attrs = {}
-        show_fields = "$('#id_{}_body').show();{}".format(f.auto_id,";".join(["$('#{0}').prop('disabled',false)".format(field.auto_id) for field in f.related_fields]))
-        hide_fields = "$('#id_{}_body').hide();{}".format(f.auto_id,";".join(["$('#{0}').prop('disabled',true)".format(field.auto_id) for field in f.related_fields]))
-
-        condition = None
-
-        if isinstance(f.field.widget,forms.widgets.RadioSelect):
-            condition ="document.getElementById('{0}').value === '{1}'".format(f.auto_id,str(self.true_value))
-            attrs["onclick"]="show_{}()".format(f.auto_id)
-        elif isinstance(f.field.widget,forms.widgets.CheckboxInput):
-            condition ="document.getElementById('{0}').checked".format(f.auto_id)
-            attrs["onclick"]="show_{}()".format(f.auto_id)
-        elif isinstance(f.field.widget,forms.widgets.Select):
-            condition ="document.getElementById('{0}').value === '{1}'".format(f.auto_id,str(self.true_value))
-            attrs["onchange"]="show_{}()".format(f.auto_id)
-        else:
+        if not isinstance(f.field.widget,(forms.widgets.RadioSelect,forms.widgets.CheckboxInput,forms.widgets.Select)):
             raise Exception("Not implemented")
 
-        js_script ="""
-            <script type="text/javascript">
-                function show_{0}() {{{{
-                    if ({1}) {{{{
-                      {2}
-                    }}}} else {{{{
-                        {3}
-                    }}}}
-                }}}}
-                $(document).ready(show_{0})
-            </script>
-        """.format(f.auto_id,condition,hide_fields if self.reverse else show_fields,show_fields if self.reverse else hide_fields)
-
-        return ((u"{}{}".format(self.edit_layout,js_script),attrs),self.related_field_names,True)
+        #the related fields are shown/hidden by the shared initialiser
+        attrs = {
+            "data-switch-target":"#id_{}_body".format(f.auto_id),
+            "data-switch-value":str(self.true_value),
+            "data-switch-disable":",".join("#{}".format(field.auto_id) for field in f.related_fields)
+        }
+        if self.reverse:
+            attrs["data-switch-reverse"] = "true"
+
+        return ((self.edit_layout,attrs),self.related_field_names,True)
     
 class OtherOptionField(CompoundField):
     """
@@ -579,17 +561,12 @@ class ConditionalMultipleField(CompoundField):
     def _edit_layout(self,f):
         return self.edit_layouts[f]
 
-class ModelChoiceFilterIterator(forms.models.ModelChoiceIterator):
-
-    def __iter__(self):
-        if self.field.empty_label is not None:
-            yield ("", self.field.empty_label,None)
-        queryset = self.queryset
-        # Can't use iterator() when queryset uses prefetch_related()
-        if not queryset._prefetch_related_lookups:
-            queryset = queryset.iterator()
-        for obj in queryset:
-            yield self.choice(obj)
+class ModelChoiceFilterIterator(CachedModelChoiceIterator):
+    #the choices include the model instances, only cached in the request
+    shareable = False
+
+    def empty_choice(self):
+        return ("", self.field.empty_label,None)
 
     def choice(self,obj):
         return (self.field.prepare_value(obj), self.field.label_from_instance(obj),obj)
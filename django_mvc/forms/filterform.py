@@ -6,6 +6,13 @@ from django.forms.fields import FileField
 from . import forms 
 
 class FilterForm(forms.ModelForm):
+    #the choice and model choice fields which show the number of the rows for each choice, for example "status (123)"
+    facet_fields = None
+    #the timeout of the cached facet counts; the facet counts are not cached if it is None
+    facet_cache_timeout = 300
+    #the facet counts set by the view. a dict of field name to {str(value):count}
+    facet_counts = None
+
     def __init__(self, *args,**kwargs):
         if "instance" in kwargs:
             del kwargs["instance"]
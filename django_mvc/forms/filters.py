@@ -1,30 +1,44 @@
 from django.db import models
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Q,Count
+from django.core.exceptions import EmptyResultSet
 
 from django_filters.rest_framework import *
 
 from django_filters import filters
 from django_filters.constants import EMPTY_VALUES
 
+from django_mvc import search
+from django_mvc import cache as mvc_cache
+from django_mvc.utils import hashvalue
+
+_filterclasses = []
 
 class Filter(FilterSet):
+    def __init_subclass__(cls,**kwargs):
+        super().__init_subclass__(**kwargs)
+        _filterclasses.append(cls)
+
     def __init__(self,form,request=None,queryset=None):
         queryset = form._meta.model.objects.all() if queryset is None else queryset
         super(Filter,self).__init__(request,queryset=queryset)
         self._form = form
 
-    def filter_queryset(self, queryset):
+    def filter_queryset(self, queryset, excludes=None):
         """
         Filter the queryset with the underlying form's `cleaned_data`. You must
         call `is_valid()` or `errors` before calling this method.
 
         This method should be overridden if additional filtering needs to be
         applied to the queryset before it is cached.
+
+        excludes: the filters which are not applied
         """
         for name, value in self.form.cleaned_data.items():
             if value is None:
                 continue
+            elif excludes and name in excludes:
+                continue
             elif isinstance(value,models.Model):
                 value = value.pk
             elif name not in self.filters:
@@ -35,11 +49,52 @@ class Filter(FilterSet):
                 % (type(self).__name__, name, type(queryset).__name__)
         return queryset
 
+    def get_facet_counts(self,names,timeout=None):
+        """
+        Return a dict of filter name to facet counts {str(value):count}.
+        The counts of a facet are computed by one group by query over the queryset filtered by all other active filters,
+        and cached with the generation of the model if timeout is not None.
+        """
+        cache = mvc_cache.get_cache() if timeout else None
+        generations = mvc_cache.get_generations([self.queryset.model]) if cache else None
+        result = {}
+        for name in names:
+            f = self.filters.get(name)
+            if f is None:
+                continue
+            field_name = f.field_name
+            queryset = self.filter_queryset(self.queryset.all(),excludes=(name,)).order_by()
+            key = None
+            counts = None
+            if cache:
+                try:
+                    key = "mvc_facets_{}".format(hashvalue("{}|{}|{}".format(field_name,str(queryset.query),generations)))
+                    counts = cache.get(key)
+                except EmptyResultSet:
+                    key = None
+            if counts is None:
+                counts = dict((str(row[field_name]),row["count"]) for row in queryset.values(field_name).annotate(count=Count("pk",distinct=True)))
+                if key:
+                    cache.set(key,counts,timeout)
+            result[name] = counts
+        return result
+
 
 class QFilter(filters.CharFilter):
-    def __init__(self, fields, **kwargs):
+    """
+    Search the value in multiple fields.
+    fields: a list of (field path,lookup)
+    indexed: search the text fields through the full-text index if available, see django_mvc.search; default is False.
+        the index matches the words of the search value as word prefixes, so a text in the middle of a word is not matched
+    """
+    def __init__(self, fields, indexed=False, **kwargs):
         super(QFilter,self).__init__( **kwargs)
         self.fields = fields
+        self.indexed = indexed
+
+    @property
+    def search_fields(self):
+        return [f[0] for f in self.fields if f[1] in search.TEXT_LOOKUPS]
 
     def filter(self, qs, value):
         if value in EMPTY_VALUES:
@@ -47,7 +102,15 @@ class QFilter(filters.CharFilter):
         if self.distinct:
             qs = qs.distinct()
         qfilter = None
-        for field in self.fields:
+        fields = self.fields
+        if self.indexed:
+            search_fields = self.search_fields
+            indexed_filter = search.search_q(qs,value,search_fields) if search_fields else None
+            if indexed_filter is not None:
+                qfilter = indexed_filter
+                fields = [f for f in self.fields if f[1] not in search.TEXT_LOOKUPS]
+
+        for field in fields:
             if qfilter:
                 qfilter = qfilter | Q(**{"{0}__{1}".format(*field):value})
             else:
@@ -57,6 +120,19 @@ class QFilter(filters.CharFilter):
 
 
 
+def register_search_fields():
+    """
+    Register the search fields of the indexed QFilters declared in the filter classes
+    """
+    for cls in _filterclasses:
+        model = getattr(cls._meta,"model",None)
+        if not model:
+            continue
+        for f in cls.base_filters.values():
+            if isinstance(f,QFilter) and f.indexed and f.search_fields:
+                search.register(model,f.search_fields)
+
+
 class DateRangeFilter(filters.DateRangeFilter):
     choices = [
         ('today', 'Today'),
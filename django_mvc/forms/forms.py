@@ -16,20 +16,31 @@ from django.contrib import messages
 from django.core.exceptions import ValidationError,ObjectDoesNotExist
 from django.conf import settings
 from django.core import validators
+from django.core import signing
 import django.db.models.fields
 from django.dispatch import receiver
 
 from . import widgets
 from . import fields
 from . import boundfield
+from . import choices
 from .fields import (CompoundField,FormField,FormSetField,AliasFieldMixin)
 
 from .utils import FieldClassConfigDict,FieldWidgetConfigDict,FieldLabelConfigDict,SubpropertyEnabledDict,ChainDict,Media,NoneValueKey
 from ..models import DictMixin,Audit,ModelDictWrapper
 from django_mvc.signals import widgets_inited,forms_inited
 from django_mvc.utils import load_module,is_equal
+from django_mvc import audit
+from django_mvc import autocomplete
+from django_mvc import cache as mvc_cache
 
 
+class ConcurrentUpdateError(Exception):
+    """
+    Raised if a instance restored from a snapshot was changed by others before it is updated
+    """
+    pass
+
 class FormTemplateMixin(object):
     """
     Provide a template to show form, 
@@ -861,6 +872,9 @@ class BaseFormMetaclassMixin(object):
         for field in new_class.base_fields.values():
             if hasattr(field.widget,"media") and field.widget.media:
                 media += field.widget.media
+            #the media required by the field itself, for example the compound fields
+            if getattr(field,"media",None):
+                media += field.media
 
         setattr(opts,"media",media)
         setattr(new_class,"media",media)
@@ -1023,7 +1037,15 @@ class FormInitMixin(object):
         _editable_formfields = []
         _editable_formsetfields = []
         form_fields_extended = False
+        is_model_form = issubclass(cls,forms.models.BaseModelForm)
+        _limit_choices_fields = []
         for name,field in cls.all_fields.items():
+            #share the evaluated choices of the model choice fields in the request
+            choices.install(field)
+            if is_model_form and choices.prepare_limit_choices_to(field) in (choices.LIMIT_PER_REQUEST,choices.LIMIT_PER_INSTANCE):
+                _limit_choices_fields.append(name)
+            if isinstance(field,forms.ModelChoiceField) and isinstance(field.widget,widgets.AutocompleteMixin):
+                autocomplete.register(cls,name,field)
             if isinstance(field,FormSetField):
                 #set the correct widget for FormSetField
                 field.widget = widgets.FormSetDisplayWidget(field) if field.is_display else widgets.FormSetWidget(field)
@@ -1088,6 +1110,12 @@ class FormInitMixin(object):
             update_model_properties = None
 
         setattr(opts,'_editable_fields',_editable_fields)
+        #the fields whose limit_choices_to is applied for each form instance
+        setattr(opts,'_limit_choices_fields',_limit_choices_fields)
+        #the editable fields cleaned by django form, and the fields which update the model fields, (field name,is m2m field)
+        _editable_fields_dict = OrderedDict((n,cls.all_fields[n]) for n in _editable_fields)
+        setattr(opts,'_editable_fields_dict',_editable_fields_dict)
+        setattr(opts,'_update_fields',[(n,n not in update_db_fields) for n in _editable_fields_dict.keys() if n in update_db_fields or n in update_m2m_fields])
         setattr(opts,'_editable_formfields',_editable_formfields)
         setattr(opts,'_editable_formsetfields',_editable_formsetfields)
         setattr(opts,'form_fields_extended',form_fields_extended)
@@ -1174,6 +1202,12 @@ class BaseModelForm(FormInitMixin,ModelFormMetaMixin,forms.models.BaseModelForm,
     is_created = None
     #contain all the changed data , for debug
     _changed_data = None
+    #the queryset used to update the instance conditionally if the instance is restored from a snapshot
+    snapshot_queryset = None
+    #if False, the model instance is not validated when cleaning the form; set by the formset for the unchanged rows
+    validate_model = True
+    #if True, the unique checks are skipped by validate_unique; set by the formset which checks the uniqueness of the changed rows in bulk
+    defer_unique_checks = False
 
     def __init__(self, data=None, files=None, auto_id='id_%s', prefix=None,
                  initial=None, error_class=ErrorList, label_suffix=None,
@@ -1225,8 +1259,9 @@ class BaseModelForm(FormInitMixin,ModelFormMetaMixin,forms.models.BaseModelForm,
         if is_bound is not None:
             self.is_bound = is_bound
 
-        for formfield in self.fields.values():
-            forms.models.apply_limit_choices_to_to_formfield(formfield)
+        #the static limit_choices_to was applied to the field once by the form class
+        for name in self._meta._limit_choices_fields:
+            choices.apply_limit_choices_to(self.fields[name])
 
         if parent_instance:
             self.set_parent_instance(parent_instance)
@@ -1448,20 +1483,18 @@ class BaseModelForm(FormInitMixin,ModelFormMetaMixin,forms.models.BaseModelForm,
             #get all changed db fields and m2m fields
             self.changed_db_fields = []
             self.changed_m2m_fields = []
-            for key in self.fields.keys():
+            for key,is_m2m in self.get_update_fields():
                 try:
-                    if key in self.update_db_fields:
+                    if not is_m2m:
                         if not is_equal(self.cleaned_data.get(key),getattr(self.instance,key)):
                             self.changed_db_fields.append(key)
                             #for debug
                             self._changed_data[key] = (getattr(self.instance,key), self.cleaned_data.get(key))
-                    elif key in self.update_m2m_fields:
+                    else:
                         if not is_equal(self.cleaned_data.get(key),getattr(self.instance,key)):
                             self.changed_m2m_fields.append(key)
                             #for debug
                             self._changed_data[key] = (getattr(self.instance,key).all(), self.cleaned_data.get(key))
-                    else:
-                        pass
                 except Exception as ex:
                     traceback.print_exc()
                     raise Exception("Failed to check whether the model field({}.{}.{}) is equal with the post data.{} ".format(self._meta.model.__module__,self._meta.model.__class__.__name__,key,str(ex)))
@@ -1483,7 +1516,14 @@ class BaseModelForm(FormInitMixin,ModelFormMetaMixin,forms.models.BaseModelForm,
 
         #call the parent method to perform the basice cleaning.
         if self.fields:
-            super(BaseModelForm,self)._post_clean()
+            if self.validate_model:
+                super(BaseModelForm,self)._post_clean()
+            else:
+                #the posted data is the same as the instance data, copy the cleaned data to the instance without validating the instance
+                try:
+                    self.instance = forms.models.construct_instance(self,self.instance,self._meta.fields,self._meta.exclude)
+                except ValidationError as e:
+                    self._update_errors(e)
 
 
         #clean formset fields and form fields
@@ -1536,55 +1576,125 @@ class BaseModelForm(FormInitMixin,ModelFormMetaMixin,forms.models.BaseModelForm,
                                     changed = True
                                     break
         
-                if not changed:
-                    print("{}({}) was not changed".format(self.instance.__class__.__name__,self.instance.pk))
                 self._is_changed = changed
             finally:
                 pass
-                #print the changed data for debug
-                if self.is_created:
-                    print("create a {} instance".format(self.instance.__class__.__name__))
-                elif self._changed_data:
-                    if (self.changed_db_fields or self.changed_m2m_fields or self.changed_model_properties):
-                        print("{}({}) was changed. {}{}{}".format(
-                            self.instance.__class__.__name__,self.instance.pk,
-                            "changed db fields:{}".format(["{}({} => {})".format(f,*self._changed_data.get(f,("!Err","!Err"))) for f in self.changed_db_fields]) if self.changed_db_fields else "", 
-                            "  changed properties:{}".format(["{}({} => {})".format(p,*self._changed_data.get(p,["!Err","!Err"])) for p in self.changed_model_properties]) if self.changed_model_properties else "",
-                            "  changed m2m fields:{}".format(["{}({} => {})".format(f,*self._changed_data.get(f,("!Err","!Err"))) for f in self.changed_m2m_fields]) if self.changed_m2m_fields else ""
-    
-                    ))
-                    for name in self.editable_formsetfieldnames:
-                        field = self[name]
-                        if field.is_changed:
-                            print("Formset field ({}) was changed".format(name))
-        
-                    for name in self.editable_formfieldnames:
-                        field = self[name]
-                        if field.is_changed:
-                            print("Form field ({}) was changed".format(name))
-                else:
-                    if (self.changed_db_fields or self.changed_m2m_fields or self.changed_model_properties):
-                        print("{}({}) was changed. {}{}{}".format(
-                            self.instance.__class__.__name__,self.instance.pk,
-                            "changed db fields:{}".format(self.changed_db_fields) if self.changed_db_fields else "", 
-                            "  changed properties:{}".format(self.changed_model_properties) if self.changed_model_properties else "",
-                            "  changed m2m fields:{}".format(self.changed_m2m_fields) if self.changed_m2m_fields else ""
-    
-                    ))
-                    for name in self.editable_formsetfieldnames:
-                        field = self[name]
-                        if field.is_changed:
-                            print("Formset field ({}) was changed".format(name))
-        
-                    for name in self.editable_formfieldnames:
-                        field = self[name]
-                        if field.is_changed:
-                            print("Form field ({}) was changed".format(name))
-
 
         return self._is_changed
     
 
+    @classmethod
+    def can_update_conditionally(cls):
+        """
+        Return True if the instance can be updated through a conditional update statement without loading it from database.
+        It is impossible if the form saves model properties, m2m fields, inner forms or formsets, or the model or form has a customized save method
+        """
+        opts = cls._meta
+        if opts.update_model_properties or opts.update_m2m_fields or opts._editable_formfields or opts._editable_formsetfields:
+            return False
+        if opts.model.save is not models.Model.save:
+            return False
+        if cls.save is not BaseModelForm.save:
+            return False
+        return True
+
+    @classmethod
+    def get_snapshot_fields(cls):
+        """
+        Return the model fields which are required to restore the instance from a snapshot
+        """
+        opts = cls._meta
+        if not hasattr(opts,"_snapshot_fields"):
+            snapshot_fields = []
+            for name in chain(cls.all_fields.keys(),opts.extra_update_fields,("modified",)):
+                try:
+                    dbfield = opts.model._meta.get_field(name)
+                except:
+                    continue
+                if dbfield.primary_key or not dbfield.concrete or dbfield.many_to_many or dbfield in snapshot_fields:
+                    continue
+                snapshot_fields.append(dbfield)
+            opts._snapshot_fields = snapshot_fields
+        return opts._snapshot_fields
+
+    @classmethod
+    def get_snapshot_salt(cls):
+        return "django_mvc.snapshot.{}.{}".format(cls.__module__,cls.__name__)
+
+    def get_snapshot(self):
+        """
+        Return a signed snapshot of the original values of the instance
+        """
+        values = {}
+        for dbfield in self.get_snapshot_fields():
+            values[dbfield.name] = None if dbfield.value_from_object(self.instance) is None else dbfield.value_to_string(self.instance)
+        return signing.dumps({"pk":str(self.instance.pk),"values":values},salt=self.get_snapshot_salt(),compress=True)
+
+    @classmethod
+    def instance_from_snapshot(cls,snapshot,pk):
+        """
+        Restore the instance from a signed snapshot without loading it from database.
+        Raise ConcurrentUpdateError if the snapshot is invalid, expired(setting MVC_SNAPSHOT_MAX_AGE, default 86400 seconds) or doesn't belong to the instance
+        """
+        model = cls._meta.model
+        try:
+            data = signing.loads(snapshot,salt=cls.get_snapshot_salt(),max_age=getattr(settings,"MVC_SNAPSHOT_MAX_AGE",86400))
+        except signing.BadSignature:
+            data = None
+        if not data or data.get("pk") != str(pk):
+            raise ConcurrentUpdateError("The {}({}) was loaded too long ago or is invalid, please reload it and try again.".format(model._meta.verbose_name,pk))
+        instance = model(pk=model._meta.pk.to_python(data["pk"]))
+        instance._state.adding = False
+        snapshot_values = {}
+        for dbfield in cls.get_snapshot_fields():
+            value = data["values"].get(dbfield.name)
+            value = None if value is None else dbfield.to_python(value)
+            setattr(instance,dbfield.attname,value)
+            snapshot_values[dbfield.attname] = value
+        instance._snapshot = snapshot_values
+        return instance
+
+    def _update_conditionally(self):
+        """
+        Update the changed db fields with a single update statement which only succeeds if the row was not changed after the snapshot was taken.
+        The row is identified by the 'modified' field if the model has it; otherwise by the original values of the changed fields.
+        No pre_save/post_save signals are sent, the cache generation and the cached choices of the model are invalidated explicitly.
+        Raise ConcurrentUpdateError if the row was changed.
+        """
+        model = self._meta.model
+        snapshot = self.instance._snapshot
+        conditions = {"pk":self.instance.pk}
+        changes = {}
+        modified = None
+        for name in self.changed_db_fields:
+            dbfield = model._meta.get_field(name)
+            if dbfield.name == "modified":
+                modified = dbfield
+            else:
+                conditions[dbfield.attname] = snapshot.get(dbfield.attname)
+            changes[dbfield.attname] = dbfield.pre_save(self.instance,False)
+
+        if modified is None:
+            try:
+                modified = model._meta.get_field("modified")
+                if modified.attname not in snapshot:
+                    modified = None
+            except:
+                pass
+
+        if modified:
+            conditions = {"pk":self.instance.pk,modified.attname:snapshot[modified.attname]}
+
+        for k in [k for k,v in conditions.items() if v is None]:
+            del conditions[k]
+            conditions["{}__isnull".format(k)] = True
+
+        queryset = model._default_manager.all() if self.snapshot_queryset is None else self.snapshot_queryset
+        if not queryset.filter(**conditions).update(**changes):
+            raise ConcurrentUpdateError("The {}({}) was changed by others after it was loaded, please reload it and try again.".format(self.model_verbose_name,self.instance.pk))
+        mvc_cache.models_changed(model)
+        choices.model_changed(model)
+
     def get_success_message(self) :
         """
         Return update success message to show in the next page
@@ -1667,6 +1777,8 @@ class BaseModelForm(FormInitMixin,ModelFormMetaMixin,forms.models.BaseModelForm,
         if self.instance.pk:
             #update a model instance
             if commit:
+                #build the change events before saving, because the old value of m2m fields are lazy querysets
+                change_events = audit.get_events(self.instance,self._changed_data) if audit.enabled and self._changed_data else None
                 # save the instance and the m2m data immediately.
                 #assign the current user to modifier if have
                 if hasattr(self.instance,"modifier") and self.request:
@@ -1679,7 +1791,11 @@ class BaseModelForm(FormInitMixin,ModelFormMetaMixin,forms.models.BaseModelForm,
                 with transaction.atomic():
                     if  self.changed_db_fields:
                         #some db fields has been changed,save to database
-                        self.instance.save(update_fields=self.changed_db_fields)
+                        if getattr(self.instance,"_snapshot",None) is not None:
+                            #the instance is restored from a snapshot, update it conditionally
+                            self._update_conditionally()
+                        else:
+                            self.instance.save(update_fields=self.changed_db_fields)
 
                     if self.changed_model_properties and self.save_model_properties_enabled:
                         #some model properties are changed, save it
@@ -1692,6 +1808,9 @@ class BaseModelForm(FormInitMixin,ModelFormMetaMixin,forms.models.BaseModelForm,
                     self._save_formsets()
                     #save inner form data
                     self._save_forms()
+
+                    #only emit the change events if the outermost transaction is committed
+                    audit.record(change_events)
             else:
                 # If not committing, add a method to the form to allow deferred saving of m2m data.
                 self.save_m2m = self._save_m2m
@@ -1712,6 +1831,11 @@ class BaseModelForm(FormInitMixin,ModelFormMetaMixin,forms.models.BaseModelForm,
                     self.instance.save_properties()
                 self._save_formsets()
                 self._save_forms()
+                if audit.enabled:
+                    #the created instance is recorded with the saved fields
+                    audit.record(audit.get_events(self.instance,OrderedDict(
+                        (key,(None,self.cleaned_data.get(key))) for key,is_m2m in self.get_update_fields() if key in self.cleaned_data
+                    )))
 
         else:
             # If not committing, add a method to the form to allow deferred saving of m2m data.
@@ -1727,6 +1851,61 @@ class BaseModelForm(FormInitMixin,ModelFormMetaMixin,forms.models.BaseModelForm,
 
         return self.instance
 
+    @classmethod
+    def limit_choices_to_report(cls):
+        """
+        Return a dict between the field name and where the field's limit_choices_to is applied: 'class', 'request' or 'instance'.
+        The fields without limit_choices_to are not included.
+        """
+        return OrderedDict((n,f.limit_choices_mode) for n,f in cls.all_fields.items() if getattr(f,"limit_choices_mode",None))
+
+    def get_editable_fields(self):
+        """
+        Return the editable fields cleaned by django form.
+        The result is computed once per form class, and once per form instance only if the form's fields or editable fields are changed.
+        """
+        if self.fields is self.all_fields and self.editable_fieldnames is self._meta._editable_fields:
+            return self._meta._editable_fields_dict
+        if not hasattr(self,"_editable_fields"):
+            #only include the normal editable fields from db model and dynamically added fields
+            editable_fieldnames = set(self.editable_fieldnames)
+            self._editable_fields = OrderedDict([(n,f) for n,f in self.fields.items() if (n in editable_fieldnames or n not in self.all_fields) ])
+        return self._editable_fields
+
+    def get_update_fields(self):
+        """
+        Return the list of (field name,is m2m field) of the current fields which update the model fields.
+        The result is computed once per form class, and once per form instance only if the form's fields or update fields are changed.
+        """
+        if (self.fields is self.all_fields or self.fields is self._meta._editable_fields_dict) and self.update_db_fields is self._meta.update_db_fields:
+            return self._meta._update_fields
+        update_db_fields = set(self.update_db_fields)
+        update_m2m_fields = set(self.update_m2m_fields)
+        return [(n,n not in update_db_fields) for n in self.fields.keys() if n in update_db_fields or n in update_m2m_fields]
+
+    def validate_unique(self):
+        if self.defer_unique_checks:
+            return
+        super(BaseModelForm,self).validate_unique()
+
+    def has_changed_data(self):
+        """
+        Return True if the posted value of any editable field is different from its initial value.
+        The form fields and formset fields are not compared, they are always cleaned.
+        """
+        for name,field in self.fields.items():
+            if isinstance(field,(FormField,FormSetField)) or isinstance(field.widget,widgets.DisplayMixin) or field.disabled:
+                continue
+            if field.show_hidden_initial:
+                return True
+            bound_field = self[name]
+            try:
+                if field.has_changed(bound_field.initial,bound_field.data):
+                    return True
+            except ValidationError:
+                return True
+        return False
+
     def full_check(self):
         """
         Check whether the model instance data is valid or not.
@@ -1743,9 +1922,7 @@ class BaseModelForm(FormInitMixin,ModelFormMetaMixin,forms.models.BaseModelForm,
             if self.form_fields_extended:
                 opt_fields = self._meta.fields
                 self._meta.fields = self.editable_fieldnames
-                #only include the normal editable fields from db model and dynamically added fields
-                self._editable_fields = self._editable_fields if hasattr(self,'_editable_fields') else OrderedDict([(n,f) for n,f in self.fields.items() if (n in self._meta.fields or n not in self.all_fields) ])
-                self.fields = self._editable_fields
+                self.fields = self.get_editable_fields()
 
             #call clean_ method in form to validate the field data
             for name, field in self.fields.items():
@@ -1831,9 +2008,7 @@ class BaseModelForm(FormInitMixin,ModelFormMetaMixin,forms.models.BaseModelForm,
         opt_fields = self._meta.fields
         try:
             self._meta.fields = self.editable_fieldnames
-            #only include the normal editable fields from db model and dynamically added fields
-            self._editable_fields = self._editable_fields if hasattr(self,'_editable_fields') else OrderedDict([(n,f) for n,f in self.fields.items() if (n in self._meta.fields or n not in self.all_fields) ])
-            self.fields = self._editable_fields
+            self.fields = self.get_editable_fields()
             super(BaseModelForm,self).full_clean()
         finally:
             self._meta.fields = opt_fields
@@ -1,18 +1,31 @@
+from collections import OrderedDict
+
 from django.forms import formsets
+from django.forms import ModelChoiceField,ModelMultipleChoiceField
 from django.core.exceptions import ObjectDoesNotExist,ValidationError,NON_FIELD_ERRORS
 from django.forms.formsets import DELETION_FIELD_NAME
-from django.db import transaction
+from django.db import transaction,connection
+from django.db.models import QuerySet,Q
 from django.template import (Template,Context)
-from django.utils.html import mark_safe
+from django.utils.html import mark_safe,format_html,format_html_join
+from django.utils.functional import cached_property
 from django.dispatch import receiver
 
 from . import forms
+from . import widgets
+from . import choices
 from .listform import (ToggleableFieldIterator,ListModelFormMetaclass)
 from . import boundfield
 from . import fields
 from .utils import Media
+from .widgets import widgets_media
 from django_mvc.signals import listforms_inited,formsets_inited
 
+#the management field which contains the indexes of the changed rows submitted by the client.
+DIRTY_FORMS = "DIRTY_FORMS"
+#the hidden field which contains the signed version of the row
+ROW_VERSION = "__version__"
+
 class FormSetMedia(Media):
     """
     Provide the media required by the formset
@@ -119,10 +132,21 @@ class FormSet(forms.ActionMixin,forms.RequestUrlMixin,formsets.BaseFormSet):
     model_name_lower=None
     model_primary_key = "id"
     _bound_footerfields_cache = None
+    _forms_cache = None
+
+    #if True, the client only submits the changed rows; the unchanged rows are neither constructed from the post data nor validated.
+    dirty_rows_only = False
+    #if True, the model instances of the unchanged rows are not validated, and the uniqueness of the changed rows is checked in bulk
+    incremental_clean = True
+    #if True, the formset is only displayed; one form is constructed and re-pointed at each row like ListForm, and no extra rows are rendered.
+    readonly = False
+    _readonly_form = None
 
-    def __init__(self,parent_instance=None,instance_list=None,check=None,*args,**kwargs):
+    def __init__(self,parent_instance=None,instance_list=None,check=None,readonly=None,*args,**kwargs):
         if check is not None:
             self.check = check
+        if readonly is not None:
+            self.readonly = readonly
 
         if "prefix" not in kwargs:
             kwargs["prefix"] = self.__class__.default_prefix
@@ -132,10 +156,144 @@ class FormSet(forms.ActionMixin,forms.RequestUrlMixin,formsets.BaseFormSet):
         self.parent_instance = parent_instance
 
         self._bound_footerfields_cache = {}
+        self._forms_cache = {}
+        self._instance_index = None
+        self._posted_primary_values = {}
+        self._invalid_rows = {}
+
+    @cached_property
+    def forms(self):
+        return [self.get_form(i) for i in range(self.total_form_count())]
+
+    @property
+    def is_readonly(self):
+        return self.readonly and not self.is_bound
+
+    def __iter__(self):
+        if self.is_readonly:
+            return self._iter_readonly()
+        return iter(self.forms)
+
+    def __len__(self):
+        if self.is_readonly:
+            return len(self.instance_list) if self.instance_list else 0
+        return len(self.forms)
+
+    def _iter_readonly(self):
+        if not self.instance_list:
+            return
+        for index,instance in enumerate(self.instance_list):
+            yield self.point_form(index,instance)
+
+    def point_form(self,index,instance):
+        """
+        Point the reusable form of the read-only formset at the row and return it.
+        The cached bound fields are rebound instead of recreated.
+        """
+        form = self._readonly_form
+        if form is None:
+            form = self._construct_form(index,instance=instance,**self.get_form_kwargs(None))
+            self._readonly_form = form
+            return form
+
+        form.set_data(instance)
+        form.prefix = self.add_prefix(index)
+        for name,bound_field in form._bound_fields_cache.items():
+            bound_field.html_name = form.add_prefix(name)
+            bound_field.html_initial_name = form.add_initial_prefix(name)
+            if hasattr(bound_field,"set_data"):
+                bound_field.set_data()
+        return form
+
+    def get_form(self,index):
+        """
+        Return the form with the index; the form is constructed on demand and cached.
+        """
+        form = self._forms_cache.get(index)
+        if form is None:
+            form = self._construct_form(index,**self.get_form_kwargs(index))
+            if getattr(form.instance,"_snapshot",None) is not None:
+                #only update the row if it belongs to the formset
+                form.snapshot_queryset = self.scoped_queryset
+            self._forms_cache[index] = form
+        return form
+
+    @property
+    def dirty_form_indexes(self):
+        """
+        Return the sorted indexes of the rows submitted by the client if only the changed rows are submitted;
+        return None if all the rows are submitted.
+        The new rows are always submitted.
+        """
+        if not self.dirty_rows_only or not self.is_bound:
+            return None
+        if not hasattr(self,"_dirty_form_indexes"):
+            value = self.data.get(self.add_prefix(DIRTY_FORMS))
+            if value is None or value.strip() == "*":
+                #the client doesn't track the changed rows.
+                indexes = None
+            else:
+                total_form_count = self.total_form_count()
+                indexes = set(int(i) for i in value.split(",") if i.strip())
+                indexes.update(range(self.initial_form_count(),total_form_count))
+                indexes = sorted(i for i in indexes if i >= 0 and i < total_form_count)
+            self._dirty_form_indexes = indexes
+        return self._dirty_form_indexes
+
+    def is_submitted_form(self,index):
+        indexes = self.dirty_form_indexes
+        return indexes is None or index in indexes
+
+    @property
+    def submitted_forms(self):
+        """
+        Return the forms submitted by the client.
+        """
+        indexes = self.dirty_form_indexes
+        if indexes is None:
+            return self.forms
+        else:
+            return [self.get_form(i) for i in indexes]
+
+    @property
+    def dirty_rows_form(self):
+        """
+        The hidden fields required by the dirty rows only mode: the indexes of the changed rows and the signed version of each row.
+        The changed rows are set by the client before submitting, "*" means all rows are submitted
+        """
+        if not self.dirty_rows_only:
+            return ""
+        html = format_html('<input type="hidden" name="{}" value="*" data-dirty-rows="{}">',self.add_prefix(DIRTY_FORMS),self.prefix)
+        if not hasattr(self.form,"get_snapshot"):
+            return html
+        return html + format_html_join("",'<input type="hidden" name="{}" value="{}">',(
+            (self.get_form_field_name(i,ROW_VERSION),form.get_snapshot()) for i,form in enumerate(self.forms) if form.instance.pk
+        ))
+
+    def get_row_version(self,index):
+        if not self.dirty_rows_only:
+            return None
+        return self.data.get(self.get_form_field_name(index,ROW_VERSION))
+
+    @property
+    def is_changed(self):
+        """
+        must called after full_clean
+        Return True if any submitted row is changed or deleted
+        """
+        for form in self.submitted_forms:
+            if form.can_delete:
+                if form.instance.pk:
+                    return True
+            elif form.is_changed:
+                return True
+        return False
 
     @property
     def form_instance(self):
-        if len(self) > 0:
+        if self.is_readonly and self.instance_list:
+            return self._readonly_form or self.point_form(0,self.instance_list[0])
+        elif len(self) > 0:
             self[0].requesturl = self.requesturl
             return self[0]
         elif not hasattr(self,"_form_instance"):
@@ -180,13 +338,37 @@ class FormSet(forms.ActionMixin,forms.RequestUrlMixin,formsets.BaseFormSet):
 
     def set_data(self,data):
         self.instance_list = data
+        self.initial = data
+        #discard the forms constructed for the previous data
+        self.__dict__.pop("forms",None)
+        self._forms_cache = {}
+        self._instance_index = None
+        self._posted_primary_values = {}
+        self._invalid_rows = {}
+        self.__dict__.pop("scoped_queryset",None)
 
     def _should_delete_form(self,form):
         return False
 
     def get_form_kwargs(self, index):
         kwargs = super(FormSet,self).get_form_kwargs(index)
-        if self.instance_list and index < len(self.instance_list):
+        if index is None:
+            #the reusable form of the read-only formset
+            pass
+        elif self.is_bound and self.dirty_form_indexes is not None and index < self.initial_form_count():
+            if self.is_submitted_form(index):
+                kwargs["instance"] = self.get_instance(index)
+            elif not self.instance_list or index >= len(self.instance_list):
+                #the instance list was changed after the page was rendered
+                self._invalid_rows[index] = ValidationError("The {} was changed by others after it was loaded, please reload it and try again.".format(self.form.model_verbose_name),code="changed_rows")
+                kwargs["data"] = None
+                kwargs["files"] = None
+            else:
+                #the unchanged row is not submitted, construct a unbound form from the instance
+                kwargs["instance"] = self.instance_list[index]
+                kwargs["data"] = None
+                kwargs["files"] = None
+        elif self.instance_list and index < len(self.instance_list):
             if self.is_bound:
                 kwargs["instance"] = self.get_instance(index)
             else:
@@ -250,16 +432,82 @@ class FormSet(forms.ActionMixin,forms.RequestUrlMixin,formsets.BaseFormSet):
             if field and field in self.cleaned_data:
                 del self.cleaned_data[field]
 
+    def get_posted_primary_value(self,index):
+        """
+        Return the cleaned primary value of the posted row; the value or the validation error is cached for each row
+        """
+        try:
+            value = self._posted_primary_values[index]
+        except KeyError:
+            name = self.get_form_field_name(index,self.primary_field)
+            try:
+                value = self.form.all_fields[self.primary_field].clean(self.data.get(name))
+            except ValidationError as ex:
+                value = ex
+            self._posted_primary_values[index] = value
+        if isinstance(value,ValidationError):
+            raise value
+        return value
+
+    @property
+    def instance_index(self):
+        """
+        Return a dict between the primary value and the instance of the instance list and the posted rows.
+        The dict is built once; the posted rows which are not in the instance list are loaded with one query from the scoped queryset,
+        so the rows which don't belong to the formset are not found even if the instance list is sliced or paged.
+        """
+        if self._instance_index is None:
+            index = dict((getattr(o,self.primary_field),o) for o in (self.instance_list or []))
+            missing = set()
+            for i in range(self.total_form_count() if self.is_bound else 0):
+                try:
+                    value = self.get_posted_primary_value(i)
+                except ValidationError:
+                    continue
+                if value and value not in index:
+                    missing.add(value)
+            if missing and self.scoped_queryset is not None:
+                for o in self.scoped_queryset.filter(**{"{}__in".format(self.primary_field):missing}):
+                    index[getattr(o,self.primary_field)] = o
+            self._instance_index = index
+        return self._instance_index
+
+    @cached_property
+    def scoped_queryset(self):
+        """
+        Return the queryset of the rows which belong to the formset, without the slicing and ordering of the instance list;
+        return None if the instance list is not a queryset
+        """
+        if not isinstance(self.instance_list,QuerySet):
+            return None
+        queryset = self.instance_list.all()
+        queryset.query.clear_limits()
+        queryset.query.clear_ordering(force_empty=True)
+        return queryset
+
     def get_instance(self,index):
+        """
+        Return the instance of the posted row.
+        If the posted row doesn't exist, doesn't belong to the formset or its row version is invalid or expired,
+        the row is recorded as a invalid row which fails the validation, and None is returned.
+        """
         if self.primary_field:
-            name = self.get_form_field_name(index,self.primary_field)
-            value = self.data.get(name)
-            value = self.form.all_fields[self.primary_field].clean(value)
+            value = self.get_posted_primary_value(index)
             if value:
-                for instance in self.instance_list:
-                    if value == getattr(instance,self.primary_field):
-                        return instance
-                raise ObjectDoesNotExist("{}({}) doesn't exist".format(self.form.model_verbose_name,value))
+                version = self.get_row_version(index)
+                if version and self.primary_field == self.form._meta.model._meta.pk.name and self.form.can_update_conditionally():
+                    #restore the instance from the signed row version without loading it; the instance will be updated only if the row is not changed by others.
+                    #the row must belong to the formset: the conditional update is restricted to the scoped queryset, see get_form
+                    if self.scoped_queryset is not None or value in self.instance_index:
+                        try:
+                            return self.form.instance_from_snapshot(version,value)
+                        except forms.ConcurrentUpdateError as ex:
+                            self._invalid_rows[index] = ValidationError(str(ex),code="concurrent_update")
+                            return None
+                elif value in self.instance_index:
+                    return self.instance_index[value]
+                self._invalid_rows[index] = ValidationError("{}({}) doesn't exist".format(self.form.model_verbose_name,value),code="missing_row")
+                return None
             else:
                 return None
         elif index < len(self.instance_list):
@@ -267,6 +515,13 @@ class FormSet(forms.ActionMixin,forms.RequestUrlMixin,formsets.BaseFormSet):
         else:
             return None
 
+    @property
+    def invalid_row_errors(self):
+        """
+        Return the validation errors of the posted rows which can't be restored, see get_instance
+        """
+        return [error for index,error in sorted(self._invalid_rows.items())]
+
     def full_check(self):
         if self._errors is None:
             self._errors = {}
@@ -286,13 +541,25 @@ class FormSet(forms.ActionMixin,forms.RequestUrlMixin,formsets.BaseFormSet):
         return False if self._errors else True
 
 
+    def is_valid(self):
+        if self.dirty_form_indexes is None:
+            return super(FormSet,self).is_valid()
+        #the unsubmitted rows are valid
+        return not self.errors
+
     def full_clean(self):
         if self._errors is None:
             if not self.is_bound:
                 self._errors = {}
                 return
+            if self.dirty_form_indexes is not None:
+                self._full_clean_submitted_forms()
+                return
             errors = {}
+            self.prefetch_choices(self.forms)
+            self.clean_forms(self.forms)
             super().full_clean()
+            self._non_form_errors.extend(self.invalid_row_errors)
             for i in range(0, self.total_form_count()):
                 form = self.forms[i]
                 if self.is_bound and self.can_delete and self._should_delete_form(form):
@@ -303,9 +570,124 @@ class FormSet(forms.ActionMixin,forms.RequestUrlMixin,formsets.BaseFormSet):
             if self._non_form_errors:
                 errors[NON_FIELD_ERRORS] = self._non_form_errors
             self._errors = errors
+
+    def _full_clean_submitted_forms(self):
+        """
+        Only validate the submitted rows
+        """
+        errors = {}
+        self._non_form_errors = self.error_class()
+        self.prefetch_choices(self.submitted_forms)
+        self.clean_forms(self.submitted_forms)
+        for form in self.submitted_forms:
+            form_errors = form.errors
+            if self.can_delete and self._should_delete_form(form):
+                #this form was removed by the user,ignore
+                continue
+            if form_errors:
+                errors[id(form.instance)] = form_errors
+        try:
+            self.clean()
+        except ValidationError as e:
+            self._non_form_errors = self.error_class(e.error_list)
+        self._non_form_errors.extend(self.invalid_row_errors)
+        if self._non_form_errors:
+            errors[NON_FIELD_ERRORS] = self._non_form_errors
+        self._errors = errors
         
 
 
+    def clean_forms(self,rows):
+        """
+        Clean the rows before the formset is cleaned.
+        If incremental_clean is True, the model instances of the existing rows whose posted data is not changed are not validated,
+        and the uniqueness of the changed rows is checked with one query per unique constraint.
+        """
+        if not self.incremental_clean:
+            return
+        model = self.form._meta.model
+        #the unique checks for date are performed by the form
+        bulk = not any(f.unique_for_date or f.unique_for_month or f.unique_for_year for f in model._meta.fields)
+        changed_forms = []
+        try:
+            for form in rows:
+                if not form.is_bound:
+                    continue
+                if form.instance.pk and not form.has_changed_data():
+                    form.validate_model = False
+                else:
+                    form.defer_unique_checks = bulk
+                    changed_forms.append(form)
+                form.errors
+            if bulk:
+                self.validate_unique_in_bulk(changed_forms)
+        finally:
+            for form in rows:
+                form.validate_model = True
+                form.defer_unique_checks = False
+
+    def validate_unique_in_bulk(self,rows):
+        """
+        Check the unique constraints of the cleaned rows with one query per unique constraint,
+        and report the errors as the form's validate_unique does
+        """
+        constraints = OrderedDict()
+        for form in rows:
+            if not form._validate_unique:
+                continue
+            instance = form.instance
+            unique_checks,date_checks = instance._get_unique_checks(exclude=form._get_validation_exclusions())
+            for model_class,unique_check in unique_checks:
+                lookup = []
+                for field_name in unique_check:
+                    f = instance._meta.get_field(field_name)
+                    value = getattr(instance,f.attname)
+                    if value is None or (value == "" and connection.features.interprets_empty_strings_as_nulls):
+                        continue
+                    if f.primary_key and not instance._state.adding:
+                        #no need to check the primary key of a existing instance
+                        continue
+                    lookup.append((str(field_name),value))
+                if len(lookup) != len(unique_check):
+                    continue
+                pk = None if instance._state.adding else instance._get_pk_val(model_class._meta)
+                constraints.setdefault((model_class,tuple(unique_check)),[]).append((form,tuple(lookup),pk))
+
+        errors = OrderedDict()
+        for (model_class,unique_check),checks in constraints.items():
+            qfilter = None
+            for form,lookup,pk in checks:
+                if qfilter is None:
+                    qfilter = Q(**dict(lookup))
+                else:
+                    qfilter |= Q(**dict(lookup))
+            existing = {}
+            for row in model_class._default_manager.filter(qfilter).values_list("pk",*unique_check):
+                existing.setdefault(tuple(row[1:]),set()).add(row[0])
+
+            key = unique_check[0] if len(unique_check) == 1 else NON_FIELD_ERRORS
+            for form,lookup,pk in checks:
+                pks = existing.get(tuple(v for n,v in lookup))
+                if pks and (pk is None or pks - set([pk])):
+                    errors.setdefault(form,OrderedDict()).setdefault(key,[]).append(form.instance.unique_error_message(model_class,unique_check))
+
+        for form,form_errors in errors.items():
+            form._update_errors(ValidationError(form_errors))
+
+    def prefetch_choices(self,rows):
+        """
+        Load the posted model instances of the model choice fields with one query per field for all the rows
+        """
+        if not rows:
+            return
+        for name,field in rows[0].fields.items():
+            if (
+                not isinstance(field,ModelChoiceField) or isinstance(field,ModelMultipleChoiceField) or
+                field.disabled or isinstance(field.widget,widgets.DisplayMixin)
+            ):
+                continue
+            choices.prefetch(field,[field.widget.value_from_datadict(form.data,form.files,form.add_prefix(name)) for form in rows])
+
     def _should_delete_form(self,form):
         """Return whether or not the form was marked for deletion."""
         should_delete = super(FormSet,self)._should_delete_form(form)
@@ -352,8 +734,7 @@ class FormSet(forms.ActionMixin,forms.RequestUrlMixin,formsets.BaseFormSet):
         if not self.is_bound:  # Stop further processing.
             return
         with transaction.atomic():
-            for i in range(0, self.total_form_count()):
-                form = self.forms[i]
+            for form in self.submitted_forms:
                 if self.can_delete and self._should_delete_form(form):
                     if form.instance.pk:
                         form.instance.delete()
@@ -416,7 +797,7 @@ def TemplateFormsetFactory(form,formset):
 
 def formset_factory(form, formset=FormSet, extra=1, can_order=False,
                     can_delete=False, max_num=None, validate_max=False,can_add=True,
-                    min_num=None, validate_min=False,primary_field=None,all_actions=None,all_buttons=None,row_template=None,template=None):
+                    min_num=None, validate_min=False,primary_field=None,all_actions=None,all_buttons=None,row_template=None,template=None,dirty_rows_only=False):
 
     cls = formsets.formset_factory(form,formset=formset,extra=extra,can_order=can_order,can_delete=can_delete,max_num=max_num,validate_max=validate_max,min_num=min_num,validate_min=validate_min)
     cls.primary_field = primary_field or form._meta.model._meta.pk.name
@@ -489,12 +870,17 @@ def formset_factory(form, formset=FormSet, extra=1, can_order=False,
         cls.all_buttons = all_buttons
 
     cls.can_add = can_add
+    cls.dirty_rows_only = dirty_rows_only
 
     if cls.can_add:
         cls.template_forms = formsets.formset_factory(form,formset=TemplateFormsetFactory(form,formset),extra=1,min_num=1,max_num=1)(prefix=cls.default_prefix)
         for field in cls.template_forms[0].fields.values():
             field.required=False
     
+    if cls.dirty_rows_only:
+        #the changed rows are tracked by the shared widget script
+        cls.media = (cls.media + widgets_media) if cls.media else widgets_media
+
     if not cls.can_add and not cls.can_delete:
         cls.form_media = None
     else:
@@ -434,6 +434,8 @@ class ListForm(ListFormInitMixin,forms.ActionMixin,forms.RequestUrlMixin,forms.M
         self.index = -1
         self.parent_instance = parent_instance
         self.dataform = self._meta.listmemberform(self)
+        #the rendered columns of the current page. key is field name, value is the list of html
+        self._column_html_cache = {}
         if self._meta.subproperty_enabled:
             self.current_instance = SubpropertyEnabledDict({})
 
@@ -539,6 +541,21 @@ class ListForm(ListFormInitMixin,forms.ActionMixin,forms.RequestUrlMixin,forms.M
     def set_data(self,data):
         self.index = -1;
         self.instance_list = data
+        self._column_html_cache = {}
+
+    def get_column_html(self,name):
+        """
+        Return the rendered html of the column for all the rows of the current page;
+        return None if the current row is not in the page
+        """
+        if self.index < 0 or self.index >= len(self):
+            return None
+        try:
+            return self._column_html_cache[name]
+        except KeyError:
+            column = self[name].render_many()
+            self._column_html_cache[name] = column
+            return column
 
     def full_check(self):
         self._errors = ErrorDict()
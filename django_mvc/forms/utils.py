@@ -1,6 +1,8 @@
 import json
 from collections import OrderedDict
 import hashlib
+import threading
+import decimal
 import pytz
 
 from django import forms
@@ -50,6 +52,41 @@ class Media(forms.Media):
             combined._statements = self._statements
         return combined
 
+#the value types whose rendered html can be memoised; the rendered html of other types(for example model instance) may be changed with the state of the object
+MEMOISABLE_TYPES = (str,int,float,bool,decimal.Decimal,type(None))
+
+class LRUCache(object):
+    """
+    A thread safe bounded cache which discards the least recently used items
+    """
+    def __init__(self,maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self,key,default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self,key,value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
 class NoneValueKey(KeyError):
     pass
 
@@ -3,12 +3,12 @@ from .widgets import (DisplayWidget,DisplayMixin,TextDisplay,FinancialYearDispla
         TemplateDisplay,HtmlString,
         TemplateWidgetFactory,SwitchWidgetFactory,ChoiceWidgetFactory,SelectableSelect,
         DisplayWidgetFactory,ChoiceFieldRendererFactory,HtmlTag,ImgBooleanDisplay,CheckboxBooleanDisplay,TextBooleanDisplay,DropdownMenuSelectMultiple,
-        NullBooleanSelect,AjaxWidgetFactory,HiddenInput,
+        NullBooleanSelect,AjaxWidgetFactory,AutocompleteMixin,AutocompleteWidgetFactory,HiddenInput,
         FloatDisplay,IntegerDisplay,ObjectDisplay,
         FilteredSelect,FilesizeDisplay,
         FormSetWidget,FormSetDisplayWidget,
         ListFormWidget,
-        HyperlinkWidget)
+        HyperlinkWidget,FacetCountsWidget,widgets_media)
 
 from .adminwidgets import (FilteredSelectMultiple,)
 
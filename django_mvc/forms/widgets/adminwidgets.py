@@ -16,6 +16,7 @@ class FilteredSelectMultiple(widgets.FilteredSelectMultiple):
             'admin/js/core.js',
             'admin/js/SelectBox.js',
             'django/js/SelectFilter2.js',
+            'js/mvc_widgets.js',
         ]
         css = {
             "all":['admin/css/widgets.css']
@@ -23,13 +24,7 @@ class FilteredSelectMultiple(widgets.FilteredSelectMultiple):
         return forms.Media(js=js,css=css)
 
     def render(self,name,value,attrs=None,renderer=None):
-        html = super().render(name,value,attrs=attrs,renderer=renderer)
-        if "id" in attrs:
-            html = """
-            {0}
-            <script type="text/javascript">
-                var data = $("#{1}").data();
-                SelectFilter.init("{1}", data.fieldName, parseInt(data.isStacked, 10));
-            </script>
-            """.format(html,attrs["id"])
-        return html
+        attrs = dict(attrs) if attrs else {}
+        #initialised by the shared initialiser
+        attrs["data-mvc-widget"] = "selectfilter"
+        return super().render(name,value,attrs=attrs,renderer=renderer)
@@ -5,7 +5,7 @@ from django import forms
 from django.utils.html import mark_safe
 from django.utils import timezone
 
-from .widgets import DisplayWidget
+from .widgets import DisplayWidget,widgets_media
 from ..utils import Media
 
 to_localtime = lambda d:(timezone.localtime(d) if timezone.is_aware(d) else timezone.make_aware(d)) if isinstance(d,datetime) else d
@@ -23,6 +23,40 @@ class DatetimeDisplay(DisplayWidget):
         else:
             return ""
 
+    def render_many(self,name,values,attrs=None,renderer=None):
+        #resolve the current timezone once per column, and format the repeated values once
+        tz = timezone.get_current_timezone()
+        is_null = self.is_null
+        null_value = self.null_value
+        formatted = {}
+        result = []
+        for value in values:
+            if is_null(value):
+                result.append(null_value)
+                continue
+            elif not value:
+                result.append("")
+                continue
+            try:
+                result.append(formatted[value])
+                continue
+            except KeyError:
+                pass
+            except TypeError:
+                #unhashable value
+                result.append(self._original_render(name,value,attrs=attrs,renderer=renderer))
+                continue
+            try:
+                if isinstance(value,datetime):
+                    html = (value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value,tz)).strftime(self.date_format)
+                else:
+                    html = value.strftime(self.date_format)
+            except:
+                html = value
+            formatted[value] = html
+            result.append(html)
+        return result
+
 class DatetimeInput(forms.TextInput):
     def __init__(self,format=('Y-m-d H:i',"%Y-%m-%d %H:%M"),dateformat=('Y-m-d',"%Y-%m-%d"),timeformat=('H:i','%H:%M'),width="120px",datepicker=True,timepicker=True,maxDate=None,minDate=None,maxTime=None,minTime=None,step=30,*args,**kwargs):
         if "attrs" not in kwargs:
@@ -68,17 +102,16 @@ class DatetimeInput(forms.TextInput):
                             attrs[key] = (now + timedelta(days=value)).strftime(dateformat[1])
 
 
-        self.datetime_picker = """
-        <script type="text/javascript">
-            $("#{{}}").datetimepicker({{{}}}); 
-        </script>
-        """.format(json.dumps(attrs))
+        #the datetime picker is initialised by the shared initialiser when the input is focused the first time
+        self.attrs["data-mvc-widget"] = "datetimepicker"
+        self.attrs["data-mvc-lazy"] = "true"
+        self.attrs["data-mvc-options"] = json.dumps(attrs)
 
     @property
     def media(self):
         js = [
             'js/jquery.datetimepicker.full.min.js',
-        ]
+        ] + widgets_media._js
         css = {
             "all":['css/jquery.datetimepicker.css']
         }
@@ -86,8 +119,7 @@ class DatetimeInput(forms.TextInput):
 
     def render(self,name,value,attrs=None,renderer=None):
         value = (value if isinstance(value,str) else to_localtime(value).strftime(self.format)) if value else ""
-        html = super(DatetimeInput,self).render(name,value,attrs)
-        return mark_safe("{}{}".format(html,self.datetime_picker.format(attrs["id"])))
+        return super(DatetimeInput,self).render(name,value,attrs)
 
 class DateInput(DatetimeInput):
     def __init__(self,format=('Y-m-d','%Y-%m-%d'),*args,**kwargs):
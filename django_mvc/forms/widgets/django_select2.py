@@ -4,12 +4,16 @@ except Exception as ex:
     from django_mvc.utils import class_not_imported
     DjangoSelect2MultipleWidget = class_not_imported("django_select2.forms.Select2MultipleWidget",ex)
 
+from .widgets import widgets_media
+
 class Select2MultipleWidget(DjangoSelect2MultipleWidget):
+    @property
+    def media(self):
+        return super().media + widgets_media
+
     def render(self,name,value,attrs=None,renderer=None):
-        return """
-        {}
-        <script type="text/javascript">
-        $("#{}").djangoSelect2();
-        </script>
-        """.format(super().render(name,value,attrs,renderer),attrs["id"])
+        attrs = dict(attrs) if attrs else {}
+        #initialised by the shared initialiser
+        attrs["data-mvc-widget"] = "select2"
+        return super().render(name,value,attrs,renderer)
 
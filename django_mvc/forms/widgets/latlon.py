@@ -1,28 +1,103 @@
+"""
+The degrees minutes seconds display of a point.
+
+The text is the same as the text rendered by the LatLon library, which was used before; the following LatLon quirks are kept on purpose
+so the rendered text does not change:
+    LatLon strips every '-' from the text, including the '-' in the exponent of a tiny second (e.g. 1e-05 becomes 1e05),
+    so float(repr(second).replace("-","")) is applied to the seconds less than 1e-4.
+    LatLon.Longitude normalises the longitude to the range -180 to 180 (range180) and converts the normalised degree to
+    (degree,minute,second) and back to a decimal degree before formatting it, which can change the last bits of the float;
+    format_dms and format_dms_many do the same round trip.
+"""
 try:
-    import LatLon
-except Exception as ex:
-    from django_mvc.utils import object_not_imported
-    LatLon = object_not_imported("LatLon",ex)
+    import numpy
+except ImportError:
+    numpy = None
 
 from .widgets import DisplayWidget
 
+DEGREE_SIGN = u'\N{DEGREE SIGN}'
+
+#format the column with numpy if the column has more points than this
+numpy_threshold = 32
+
+def _dms(decimal_degree):
+    """
+    Split a decimal degree into signed (degree,minute,second)
+    Use the same float operations as the LatLon library to render the same text
+    """
+    sign = (decimal_degree > 0) - (decimal_degree < 0)
+    decimal_degree = abs(decimal_degree)
+    degree = decimal_degree // 1
+    decimal_minute = (decimal_degree - degree) * 60.
+    minute = decimal_minute // 1
+    second = (decimal_minute - minute) * 60.
+    return (degree * sign,minute * sign,second * sign)
+
+def _dms_array(decimal_degree):
+    """
+    The numpy version of _dms
+    """
+    sign = numpy.sign(decimal_degree)
+    decimal_degree = numpy.abs(decimal_degree)
+    degree = decimal_degree // 1
+    decimal_minute = (decimal_degree - degree) * 60.
+    minute = decimal_minute // 1
+    second = (decimal_minute - minute) * 60.
+    return (degree * sign,minute * sign,second * sign)
+
+def _format(degree,minute,second,hemisphere):
+    second = abs(second)
+    if 0 < second < 1e-4:
+        #LatLon removes all '-' from the text, including the '-' of the exponent of a tiny second
+        second = float(repr(second).replace("-",""))
+    return "{}{} {}' {}\" {}".format(abs(int(degree)),DEGREE_SIGN,str(int(abs(minute))).zfill(2),str(round(second,1)).zfill(4),hemisphere)
+
+def format_dms(lon,lat):
+    """
+    Return the degrees minutes seconds text of a point
+    """
+    #normalise the longitude to the range -180 to 180, then convert it back and forth as LatLon.Longitude does
+    degree,minute,second = _dms(((float(lon) + 180) % 360) - 180)
+    lon = degree + minute/60. + second/3600.
+    lon_str = _format(*_dms(lon),hemisphere="W" if lon < 0 else "E")
+
+    lat = float(lat)
+    lat_str = _format(*_dms(lat),hemisphere="S" if lat < 0 else "N")
+
+    return 'Lat/Lon ' + lat_str + ', ' + lon_str
+
+def format_dms_many(lons,lats):
+    """
+    Return the degrees minutes seconds text of a list of points
+    """
+    if numpy is None or len(lons) <= numpy_threshold:
+        return [format_dms(lon,lat) for lon,lat in zip(lons,lats)]
+
+    degree,minute,second = _dms_array(((numpy.array(lons,dtype=float) + 180) % 360) - 180)
+    lons = degree + minute/60. + second/3600.
+    lon_parts = zip(*(a.tolist() for a in _dms_array(lons)))
+
+    lats = numpy.array(lats,dtype=float)
+    lat_parts = zip(*(a.tolist() for a in _dms_array(lats)))
+
+    return [
+        'Lat/Lon ' + _format(*lat_part,hemisphere="S" if lat < 0 else "N") + ', ' + _format(*lon_part,hemisphere="W" if lon < 0 else "E")
+        for lon,lat,lon_part,lat_part in zip(lons.tolist(),lats.tolist(),lon_parts,lat_parts)
+    ]
+
 class DmsCoordinateDisplay(DisplayWidget):
     def render(self,name,value,attrs=None,renderer=None):
         if value:
-            c=LatLon.LatLon(LatLon.Longitude(value.get_x()), LatLon.Latitude(value.get_y()))
-            latlon = c.to_string('d% %m% %S% %H')
-            lon = latlon[0].split(' ')
-            lat = latlon[1].split(' ')
-        
-            # need to format float number (seconds) to 1 dp
-            lon[2] = str(round(eval(lon[2]), 1))
-            lat[2] = str(round(eval(lat[2]), 1))
-        
-            # Degrees Minutes Seconds Hemisphere
-            lat_str = lat[0] + u'\N{DEGREE SIGN} ' + lat[1].zfill(2) + '\' ' + lat[2].zfill(4) + '\" ' + lat[3]
-            lon_str = lon[0] + u'\N{DEGREE SIGN} ' + lon[1].zfill(2) + '\' ' + lon[2].zfill(4) + '\" ' + lon[3]
-        
-            return 'Lat/Lon ' + lat_str + ', ' + lon_str
+            return format_dms(value.get_x(),value.get_y())
         else:
             return ""
 
+    def render_many(self,name,values,attrs=None,renderer=None):
+        is_null = self.is_null
+        result = [self.null_value if is_null(value) else ("" if not value else None) for value in values]
+        points = [(i,value) for i,value in enumerate(values) if result[i] is None]
+        if points:
+            for (i,value),html in zip(points,format_dms_many([v.get_x() for i,v in points],[v.get_y() for i,v in points])):
+                result[i] = html
+        return result
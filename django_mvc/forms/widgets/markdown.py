@@ -1,16 +1,132 @@
+"""
+Render markdown text to html.
+
+The rendered html is cached in a bounded in-process LRU cache, and optionally in the django cache, keyed by the hash of the text
+and the rendering settings(extensions and sanitiser).
+The rendered html of a model field can also be saved into another field of the model, and refreshed before the instance is saved;
+display the html field with the HtmlString widget to skip the rendering.
+
+settings:
+    MVC_MARKDOWN_CACHE_SIZE: the size of the in-process cache, default is 1024
+    MVC_MARKDOWN_CACHE_TIMEOUT: the seconds to cache the rendered html in the django cache, default is 0(disabled)
+    MVC_MARKDOWN_SANITISER: the dotted path of the default function to sanitise the rendered html, default is None
+    MVC_MARKDOWN_FIELDS: the model fields whose rendered html is saved into other fields.
+        {"app_label.ModelName":{"source field":"html field"}}
+        if a instance is saved with 'update_fields', include the html field when the source field is included,
+        otherwise the html field is not refreshed and a warning is logged.
+"""
+import logging
+
 try:
     import markdown
 except Exception as ex:
     from django_mvc.utils import object_not_imported
     markdown = object_not_imported("markdown",ex)
 
+from django.apps import apps
+from django.conf import settings
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
 from django.utils.html import mark_safe
 from django.utils.encoding import force_text
+from django.utils.module_loading import import_string
 
+from django_mvc.signals import system_ready
+from django_mvc import cache as mvc_cache
+from ..utils import hashvalue,LRUCache
 from .widgets import DisplayWidget
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXTENSIONS = ("nl2br",)
+
+_render_cache = None
+
+#the model fields whose rendered html is saved. key is model, value is a list of (source field,html field)
+_html_fields = {}
+
+def get_render_cache():
+    global _render_cache
+    if _render_cache is None:
+        _render_cache = LRUCache(getattr(settings,"MVC_MARKDOWN_CACHE_SIZE",1024))
+    return _render_cache
+
+def get_sanitiser(sanitiser=None):
+    """
+    Return (sanitiser function,the name of the sanitiser)
+    """
+    sanitiser = sanitiser or getattr(settings,"MVC_MARKDOWN_SANITISER",None)
+    if not sanitiser:
+        return (None,"")
+    elif isinstance(sanitiser,str):
+        return (import_string(sanitiser),sanitiser)
+    else:
+        return (sanitiser,"{}.{}".format(getattr(sanitiser,"__module__",""),getattr(sanitiser,"__qualname__",None) or getattr(sanitiser,"__name__","")))
+
+def render_markdown(text,extensions=DEFAULT_EXTENSIONS,sanitiser=None):
+    """
+    Return the cached html of the markdown text
+    """
+    text = force_text(text)
+    sanitiser,sanitiser_name = get_sanitiser(sanitiser)
+    key = "mvc_markdown_{}".format(hashvalue("{}|{}|{}".format(",".join(extensions),sanitiser_name,text)))
+    render_cache = get_render_cache()
+    html = render_cache.get(key)
+    if html is not None:
+        return html
+
+    timeout = getattr(settings,"MVC_MARKDOWN_CACHE_TIMEOUT",0)
+    cache = mvc_cache.get_cache() if timeout else None
+    if cache:
+        html = cache.get(key)
+    if html is None:
+        html = markdown.markdown(text,extensions=list(extensions),output_format='html')
+        if sanitiser:
+            html = sanitiser(html)
+        if cache:
+            cache.set(key,html,timeout)
+    html = mark_safe(html)
+    render_cache.set(key,html)
+    return html
+
 class Markdownify(DisplayWidget):
+    def __init__(self,*args,extensions=None,sanitiser=None,**kwargs):
+        """
+        extensions: the markdown extensions, default is ("nl2br",)
+        sanitiser: a function or the dotted path of a function to sanitise the rendered html; if None, use the setting MVC_MARKDOWN_SANITISER
+        """
+        super().__init__(*args,**kwargs)
+        self.extensions = tuple(extensions) if extensions else DEFAULT_EXTENSIONS
+        self.sanitiser = sanitiser
+
     def render(self,name,value,attrs=None,renderer=None):
-        extensions = ["nl2br"]
-        return mark_safe(markdown.markdown(force_text(value), extensions=extensions,output_format='html'))
+        return render_markdown(value,extensions=self.extensions,sanitiser=self.sanitiser)
+
+def register_html_field(model,source_field,html_field):
+    """
+    Save the rendered html of the source field into the html field before the instance is saved.
+    The caller must include the html field in 'update_fields' if the source field is included
+    """
+    fields = _html_fields.setdefault(model,[])
+    if (source_field,html_field) not in fields:
+        fields.append((source_field,html_field))
+
+@receiver(pre_save)
+def _render_html_fields(sender,instance,raw=False,update_fields=None,**kwargs):
+    if raw or sender not in _html_fields:
+        return
+    for source_field,html_field in _html_fields[sender]:
+        if update_fields is not None and html_field not in update_fields:
+            #the html field is not saved
+            if source_field in update_fields:
+                logger.warning("The html field %s.%s is not refreshed, because it is not in the update_fields which include the source field %s",sender._meta.label,html_field,source_field)
+            continue
+        value = getattr(instance,source_field)
+        setattr(instance,html_field,render_markdown(value) if value else value)
 
+@receiver(system_ready)
+def init_markdown(sender,**kwargs):
+    for model,fields in (getattr(settings,"MVC_MARKDOWN_FIELDS",None) or {}).items():
+        model = apps.get_model(model)
+        for source_field,html_field in fields.items():
+            register_html_field(model,source_field,html_field)
@@ -3,7 +3,9 @@ import json
 import locale
 
 from django import forms
+from django.conf import settings
 from django.core.cache import caches
+from django.core.exceptions import ValidationError
 from django.urls import reverse
 from django.db import models
 from django.utils.html import mark_safe
@@ -13,10 +15,13 @@ from django.template import (Template,Context)
 from django.dispatch import receiver
 from django.template.defaultfilters import filesizeformat
 
-from ..utils import hashvalue,JSONEncoder,Media
+from ..utils import hashvalue,JSONEncoder,Media,LRUCache,MEMOISABLE_TYPES
 from django_mvc.signals import listformfields_inited, widgets_inited
 from django_mvc.utils import get_class
 
+#the shared initialiser script of the widgets which declare their behaviour with data-* attributes
+widgets_media = Media(js=["js/mvc_widgets.js"])
+
 
 to_str = lambda o: "" if o is None else str(o)
 
@@ -81,6 +86,14 @@ class DisplayWidget(NullValueMixin,DisplayMixin,forms.Widget):
     def render(self,name,value,attrs=None,renderer=None):
         return str(value) if value else ""
 
+    def render_many(self,name,values,attrs=None,renderer=None):
+        """
+        Render a column of values and return the list of html.
+        The subclasses can override it to share the per value setup(formats,timezone,locale) across the column.
+        """
+        render = self.render
+        return [render(name,value,attrs=attrs,renderer=renderer) for value in values]
+
 class HtmlTag(DisplayWidget):
     """
     Render a html tag with html tag, tag attributes and value
@@ -126,6 +139,11 @@ class TextDisplay(DisplayWidget):
     def render(self,name,value,attrs=None,renderer=None):
         return to_str(value)
 
+    def render_many(self,name,values,attrs=None,renderer=None):
+        is_null = self.is_null
+        null_value = self.null_value
+        return [null_value if is_null(value) else to_str(value) for value in values]
+
 class ObjectDisplay(DisplayWidget):
     """
     Render a object.
@@ -166,6 +184,11 @@ class IntegerDisplay(DisplayWidget):
         else:
             return value
 
+    def render_many(self,name,values,attrs=None,renderer=None):
+        is_null = self.is_null
+        null_value = self.null_value
+        return [null_value if is_null(value) else ("" if value is None else value) for value in values]
+
 class FloatDisplay(DisplayWidget):
     def __init__(self,precision=2):
         self.format = '%.{}f'.format(precision)
@@ -174,7 +197,19 @@ class FloatDisplay(DisplayWidget):
         if value is None:
             return ""
         else:
-            return locale.format(self.format, value, True)
+            return locale.format_string(self.format, value, True)
+
+    def render_many(self,name,values,attrs=None,renderer=None):
+        #read the locale conventions once per column
+        conv = locale.localeconv()
+        if conv["thousands_sep"] and conv["grouping"]:
+            fmt = lambda value:locale.format_string(self.format, value, True)
+        elif conv["decimal_point"] == ".":
+            fmt = lambda value:self.format % value
+        else:
+            decimal_point = conv["decimal_point"]
+            fmt = lambda value:(self.format % value).replace(".",decimal_point)
+        return ["" if value is None else fmt(value) for value in values]
 
 class FilesizeDisplay(DisplayWidget):
     def render(self,name,value,attrs=None,renderer=None):
@@ -290,55 +325,28 @@ class SwitchWidgetMixin(object):
     reverse = False
     html_id = None
 
+    class Media:
+        js = widgets_media._js
+
     def render(self,name,value,attrs=None,renderer=None):
         value_str = str(value) if value is not None else ""
         if not self.html_id:
             html_id = "{}_switched".format( attrs.get("id"))
             wrapped_html = "<span id='{}' {} >{}</span>".format(html_id,"style='display:none'" if (not self.reverse and value_str != self.true_value) or (self.reverse and value_str == self.true_value) else "" ,self.html)
         else:
+            #the initial status of the external html element is set by the shared initialiser
             html_id = self.html_id
-            if (not self.reverse and value_str == self.true_value) or (self.reverse and value_str != self.true_value):
-                wrapped_html = ""
-            else:
-                wrapped_html = """
-                <script type="text/javascript">
-                $(document).ready(function() {{
-                    $('#{}').hide()
-                }})
-                </script>
-                """.format(html_id)
-        
-        show_html = "$('#{0}').show();".format(html_id)
-        hide_html = "$('#{0}').hide();".format(html_id)
-
-        attrs = attrs or {}
-        if isinstance(self,forms.RadioSelect):
-            attrs["onclick"]="""
-                if (this.value === '{0}') {{
-                    {1}
-                }} else {{
-                    {2}
-                }}
-            """.format(self.true_value,hide_html if self.reverse else show_html,show_html if self.reverse else hide_html)
-        elif isinstance(self,forms.CheckboxInput):
-            attrs["onclick"]="""
-                if (this.checked) {{
-                    {0}
-                }} else {{
-                    {1}
-                }}
-            """.format(hide_html if self.reverse else show_html,show_html if self.reverse else hide_html)
-        elif isinstance(self,forms.Select):
-            attrs["onchange"]="""
-                if (this.value === '{0}') {{
-                    {1}
-                }} else {{
-                    {2}
-                }}
-            """.format(self.true_value,hide_html if self.reverse else show_html,show_html if self.reverse else hide_html)
-        else:
+            wrapped_html = ""
+
+        if not isinstance(self,(forms.RadioSelect,forms.CheckboxInput,forms.Select)):
             raise Exception("Not implemented")
 
+        attrs = dict(attrs) if attrs else {}
+        attrs["data-switch-target"] = "#{}".format(html_id)
+        attrs["data-switch-value"] = self.true_value
+        if self.reverse:
+            attrs["data-switch-reverse"] = "true"
+
         widget_html = super(SwitchWidgetMixin,self).render(name,value,attrs)
         return mark_safe(self.template.format(widget_html,wrapped_html))
 
@@ -361,14 +369,38 @@ def SwitchWidgetFactory(widget_class,html=None,true_value=True,template="{0}<br>
         widget_classes[key] = cls
     return cls
 
+def memoise_render(render):
+    """
+    Memoise the html rendered by a display widget for the values of the simple types in a per class lru cache.
+    The widget class should have a class property 'render_cache', the render result is not memoised if attrs is set.
+    """
+    def _render(self,name,value,attrs=None,renderer=None):
+        if attrs or value.__class__ not in MEMOISABLE_TYPES:
+            return render(self,name,value,attrs=attrs,renderer=renderer)
+        #bool is a subclass of int, include the type in the key to distinguish True from 1
+        key = (value.__class__,value)
+        cache = self.__class__.render_cache
+        result = cache.get(key,cache)
+        if result is cache:
+            result = render(self,name,value,attrs=attrs,renderer=renderer)
+            cache.set(key,result)
+        return result
+    _render.__name__ = render.__name__
+    _render.__doc__ = render.__doc__
+    return _render
+
 class ChoiceDisplay(DisplayWidget):
     """
     A widget to render predefined html for enumeration value.
     the html can be html string or html template or html pattern
+    The rendered html of each value is memoised in a per class lru cache
     """
     choices = None
     marked_safe = False
     coerce = None
+    #the maximum number of the memoised values of a widget class
+    render_cache_size = 256
+    render_cache = None
             
     def _render_string(self,name,value,attrs=None,renderer=None):
         value = self.coerce(value)
@@ -432,9 +464,9 @@ def ChoiceWidgetFactory(name,choices,marked_safe=False,data_format=1,coerce=None
         widget_class_id += 1
         class_name = "{}_{}".format(widget_class.__name__,name)
         if data_format == ChoiceWidgetFactory.STRING:
-            cls = type(class_name,(widget_class,),{"choices":choices,"marked_safe":marked_safe,"render":ChoiceDisplay._render_string,"coerce":coerce})
+            cls = type(class_name,(widget_class,),{"choices":choices,"marked_safe":marked_safe,"render":memoise_render(ChoiceDisplay._render_string),"coerce":coerce})
         elif data_format == ChoiceWidgetFactory.PATTERN:
-            cls = type(class_name,(widget_class,),{"choices":choices,"marked_safe":marked_safe,"render":ChoiceDisplay._render_pattern,"coerce":coerce})
+            cls = type(class_name,(widget_class,),{"choices":choices,"marked_safe":marked_safe,"render":memoise_render(ChoiceDisplay._render_pattern),"coerce":coerce})
         else:
             #convert the choices value to Template
             if hasattr(choices,"choices"):
@@ -447,7 +479,9 @@ def ChoiceWidgetFactory(name,choices,marked_safe=False,data_format=1,coerce=None
                         choices.choices[index][1] = Template(choices.choices[index][1])
                         choices.choices[index] = tuple(choices.choices[index])
                     index += 1
-            cls = type(class_name,(widget_class,),{"choices":choices,"marked_safe":marked_safe,"render":ChoiceDisplay._render_template,"coerce":coerce})
+            cls = type(class_name,(widget_class,),{"choices":choices,"marked_safe":marked_safe,"render":memoise_render(ChoiceDisplay._render_template),"coerce":coerce})
+        #the choices are bounded, but the value can be any value if the choices have a default
+        cls.render_cache = LRUCache(max(cls.render_cache_size,len(choices) * 2))
         widget_classes[key] = cls
     return cls
 
@@ -498,7 +532,6 @@ class NullBooleanSelect(forms.widgets.Select):
         value = data.get(name)
         return None if (value == "-" or value == "" or value is None) else (True if value == 'True' else False) 
 
-html_id_seq = 0
 class SelectableSelect(forms.Select):
     """
     not completed
@@ -511,34 +544,12 @@ class SelectableSelect(forms.Select):
                 kwargs["attrs"]["class"] = "selectpicker dropup"
         else:
             kwargs["attrs"] = {"class":"selectpicker dropup"}
+        kwargs["attrs"]["data-mvc-widget"] = "selectpicker"
+        kwargs["attrs"]["data-mvc-options"] = json.dumps({"style":"btn-default","size":6,"liveSearch":True,"dropupAuto":False})
         super(SelectableSelect,self).__init__(**kwargs)
 
-
-    def render(self,name,value,attrs=None,renderer=None):
-        global html_id_seq
-        html_id = attrs.get("id",None) if attrs else None
-        if not html_id:
-            html_id_seq += 1
-            html_id = "auto_id_{}".format(html_id_seq)
-            if attrs is None:
-                attrs = {"id":html_id}
-            else:
-                attrs["id"] = html_id
-
-        html = super(SelectableSelect,self).render(name,value,attrs)
-
-
-        return mark_safe(u"""
-        {}
-        <script type="text/javascript">
-            $("#{}").selectpicker({{
-              style: 'btn-default',
-              size: 6,
-              liveSearch: true,
-              dropupAuto: false,
-            }});
-        </script>
-        """.format(html,html_id))
+    class Media:
+        js = widgets_media._js
 
 def ChoiceFieldRendererFactory(outer_html = None,inner_html = None,layout = None):
     """
@@ -592,19 +603,14 @@ class DropdownMenuSelectMultiple(forms.widgets.SelectMultiple):
         super().__init__(*args,**kwargs)
         self.include_all_option = include_all_option
         self.button_text = button_text
-        self.html = """
-        {{1}}
-        <script type="text/javascript">
-            $(document).ready(function(){{{{
-                $("#{{0}}").multiselect({{{{
-                    buttonClass: "btn btn-small",
-                    checkboxName: $("#{{0}}").attr("id"),
-                    includeSelectAllOption: {0},
-                    {1}
-                }}}});
-            }}}})
-        </script>
-        """.format("true" if self.include_all_option else "false","""buttonText: function() {{{{return "{0}";}}}},""".format(self.button_text) if self.button_text else "")
+        options = {"includeSelectAllOption":True if self.include_all_option else False}
+        if self.button_text:
+            options["buttonText"] = self.button_text
+        self.options = json.dumps(options)
+
+    class Media:
+        js = widgets_media._js
+
     def render(self, name, value, attrs=None, renderer=None):
         if not attrs:
             attrs={"style":"display:none"}
@@ -614,11 +620,9 @@ class DropdownMenuSelectMultiple(forms.widgets.SelectMultiple):
             attrs["style"]="display:none"
 
         attrs["id"] = name
-        html = super(DropdownMenuSelectMultiple,self).render("",value,attrs,renderer)
-        html_id = attrs.get("id")
-        if html_id:
-            html = self.html.format(html_id,html)
-        return html
+        attrs["data-mvc-widget"] = "multiselect"
+        attrs["data-mvc-options"] = self.options
+        return super(DropdownMenuSelectMultiple,self).render("",value,attrs,renderer)
 
 
 class HiddenInput(forms.Widget):
@@ -759,17 +763,102 @@ def AjaxWidgetFactory(widget_class,data_func=None,method="post",succeed=None,fai
         widget_classes[key] = cls
     return cls
 
+class AutocompleteMixin(object):
+    """
+    A model choice widget mixin which only renders the selected options,
+    the other options are fetched page by page from the autocomplete view(django_mvc.autocomplete) when the user types.
+    """
+    #the field path list to search; if None, use the default search fields of the model
+    search_fields = None
+    #the lookup used to search the fields
+    lookup = "istartswith"
+    page_size = 20
+    #the permission to use the autocomplete view: a permission string, a list of permission strings(any of them) or a permission object(django_mvc.actions.BasePermission);
+    #if None, the user must have the add, change or view permission of the model of the form
+    permission = None
+    #set by django_mvc.autocomplete.register
+    autocomplete_id = None
+
+    @property
+    def media(self):
+        return Media(
+            js=[getattr(settings,"SELECT2_JS","https://cdnjs.cloudflare.com/ajax/libs/select2/4.0.5/js/select2.min.js")],
+            css={"all":[getattr(settings,"SELECT2_CSS","https://cdnjs.cloudflare.com/ajax/libs/select2/4.0.5/css/select2.min.css")]}
+        ) + widgets_media
+
+    def optgroups(self, name, value, attrs=None):
+        from .. import choices
+        iterator = self.choices
+        queryset = getattr(iterator,"queryset",None)
+        if queryset is None:
+            return super().optgroups(name,value,attrs=attrs)
+        field = iterator.field
+        selected = [v for v in value if v not in ("",None)]
+        groups = []
+        index = 0
+        if field.empty_label is not None and not self.allow_multiple_selected:
+            groups.append((None,[self.create_option(name,"",field.empty_label,not selected,index,attrs=attrs)],index))
+        if selected:
+            try:
+                objs = choices.get_selected_objects(field,queryset,selected)
+            except (ValueError,TypeError,ValidationError):
+                #the value is invalid
+                objs = []
+            for obj in objs:
+                index += 1
+                groups.append((None,[self.create_option(name,field.prepare_value(obj),field.label_from_instance(obj),True,index,attrs=attrs)],index))
+        return groups
+
+    def render(self,name,value,attrs=None,renderer=None):
+        attrs = dict(attrs) if attrs else {}
+        if self.autocomplete_id:
+            #initialised by the shared initialiser
+            attrs["data-mvc-widget"] = "autocomplete"
+            attrs["data-mvc-options"] = json.dumps({"url":reverse("mvc_autocomplete",kwargs={"field_id":self.autocomplete_id})})
+        #render the options with the django template, the render method of the widget class is not used because it may initialise the widget in other ways
+        return forms.Widget.render(self,name,value,attrs=attrs,renderer=renderer)
+
+def AutocompleteWidgetFactory(widget_class,search_fields=None,lookup="istartswith",page_size=20,permission=None):
+    """
+    Create a autocomplete select widget class from a select widget class, for example forms.Select, FilteredSelect or Select2MultipleWidget
+    search_fields: the field path list to search
+    lookup: the lookup used to search the fields, use a indexed lookup(istartswith, startswith) for the large tables
+    permission: the permission to use the autocomplete view, see AutocompleteMixin.permission
+    """
+    global widget_class_id
+    key = "AutocompleteWidget<{}>".format(hashvalue("AutocompleteWidget<{}.{}.{}.{}.{}.{}>".format(widget_class.__module__,widget_class.__name__,search_fields,lookup,page_size,permission)))
+    cls = widget_classes.get(key)
+    if not cls:
+        widget_class_id += 1
+        class_name = "{}_autocomplete_{}".format(widget_class.__name__,widget_class_id)
+        cls = type(class_name,(AutocompleteMixin,widget_class),{"search_fields":search_fields,"lookup":lookup,"page_size":page_size,"permission":permission})
+        widget_classes[key] = cls
+    return cls
+
 class ListDisplay(DisplayWidget):
     """
     A widget to display a list value
+    The rendered html of the lists which only contain simple values is memoised in a per class lru cache
     """
     widget=None
     template=None
+    #the maximum number of the memoised lists of a widget class
+    render_cache_size = 256
+    render_cache = None
+
     def render(self,name,value,attrs=None,renderer=None):
-        if value:
-            return mark_safe(self.template.render(Context({"widgets":[self.widget.render(name,val,attrs,renderer) for val in value]})))
-        else:
+        if not value:
             return ""
+        key = None
+        if not attrs and self.render_cache is not None and isinstance(value,(list,tuple)) and all(val.__class__ in MEMOISABLE_TYPES for val in value):
+            key = tuple((val.__class__,val) for val in value)
+            result = self.render_cache.get(key)
+            if result is not None:
+                return result
+        result = mark_safe(self.template.render(Context({"widgets":[self.widget.render(name,val,attrs,renderer) for val in value]})))
+        if key is not None:
+            self.render_cache.set(key,result)
+        return result
 
 
 def ListDisplayFactory(widget,template=None):
@@ -780,7 +869,7 @@ def ListDisplayFactory(widget,template=None):
     global widget_class_id
 
     if isinstance(widget,forms.Widget):
-        key = "ListDisplay<{}>".format(hashvalue("ListDisplay<{}{}>".format(id(widget),template if self.template else "")))
+        key = "ListDisplay<{}>".format(hashvalue("ListDisplay<{}{}>".format(id(widget),template if template else "")))
         widget_class = widget.__class__
         widget = widget
     else:
@@ -800,6 +889,7 @@ def ListDisplayFactory(widget,template=None):
         widget_class_id += 1
         class_name = "{}List_{}".format(widget_class.__name__,widget_class_id)
         cls = type(class_name,(ListDisplay,),{"template":Template(template),"widget":widget})
+        cls.render_cache = LRUCache(cls.render_cache_size)
         widget_classes[key] = cls
     return cls
 
@@ -855,6 +945,35 @@ class ChoiceFilterMixin(object):
 
         return groups
 
+class FacetCountsWidget(object):
+    """
+    A proxy of a choice widget which appends the facet count to the label of each choice
+    The proxy is created for each rendering, because the widget is shared by all form instances
+    """
+    def __init__(self,widget,counts):
+        self.widget = widget
+        self.counts = counts
+
+    @classmethod
+    def wrap(cls,widget,counts):
+        #only the choice widgets rendered by the django template are supported
+        if isinstance(widget,forms.ChoiceWidget) and type(widget).render is forms.Widget.render:
+            return cls(widget,counts)
+        else:
+            return widget
+
+    def __getattr__(self,name):
+        return getattr(self.widget,name)
+
+    def render(self,name,value,attrs=None,renderer=None):
+        context = self.widget.get_context(name,value,attrs)
+        for group_name,options,index in context["widget"]["optgroups"]:
+            for option in options:
+                if option["value"] is None or option["value"] == "":
+                    continue
+                option["label"] = "{} ({})".format(option["label"],self.counts.get(str(option["value"]),0))
+        return self.widget._render(self.widget.template_name,context,renderer)
+
 class FilteredSelect(ChoiceFilterMixin,forms.Select):
     pass
 
@@ -869,7 +988,7 @@ class FormSetWidget(forms.Widget):
         return self
 
     def render(self,name,formset,errors=None,attrs=None,renderer=None):
-        return "{}{}".format(str(formset.management_form),formset.template.render(Context({"listform":formset,"errors":errors or []})))
+        return "{}{}{}".format(str(formset.management_form),formset.dirty_rows_form,formset.template.render(Context({"listform":formset,"errors":errors or []})))
 
 
 class FormSetDisplayWidget(DisplayMixin,forms.Widget):
@@ -7,7 +7,11 @@ from django.template import (Template,Context)
 from django.core.exceptions import (ObjectDoesNotExist,)
 from django.utils.html import mark_safe
 from django.db import transaction
+from django.conf import settings
 
+from django_mvc import cache as mvc_cache
+from django_mvc import search
+from django_mvc.forms import choices
 from django_mvc.forms.widgets import DisplayWidget
 
 HTML_TABLE = 1
@@ -579,32 +583,98 @@ class ObjectDependencyTree(ProtectStatusMixin):
     def html(self):
         return ObjectDependencyTreeTableWidget().render("{}({})".format(self.modelname,self.pk),self)
 
-    def _delete(self):
-        #delete protected relationship first
+    def _collect(self,heights):
+        """
+        Collect the protected objects which must be deleted before the root object.
+        heights: a dict between (model,pk) and the height of the object, an object is deleted after the objects with a lower height
+        Return the max height of the collected objects in this tree; return -1 if no object is collected
+        """
+        height = -1
         if self.protect_status & self.PROTECTED_BY_CHILDREN == self.PROTECTED_BY_CHILDREN:
             #protected by children
-            #delete protected onetoone relationship
+            #collect protected onetoone relationship
             for subtree in self.one2one_subtrees:
                 if subtree[1].protect_status & (self.PROTECTED |self.PROTECTED_BY_CHILDREN) > 0: 
                     #protected or  indirect protected
-                    subtree[1]._delete()
+                    height = max(height,subtree[1]._collect(heights))
 
-            #delete protected onetomany relationship
+            #collect protected onetomany relationship
             for subtree in self.one2many_subtrees:
                 if subtree[0].protect_status & (self.PROTECTED |self.PROTECTED_BY_CHILDREN) > 0: 
                     #protected or  indirect protected
                     for tree in subtree[1]:
                         if tree.protect_status & (self.PROTECTED |self.PROTECTED_BY_CHILDREN) > 0: 
-                            tree._delete()
+                            height = max(height,tree._collect(heights))
 
         if self.protect_status & self.PROTECTED == self.PROTECTED:
-            #print("Delete protected object {}({})".format(self.modelname,self.pk))
-            self.obj.delete()
+            height += 1
+            key = (self.model_tree.model,self.pk)
+            #the object can be referenced by several paths, delete it after all its dependent objects
+            heights[key] = max(heights.get(key,height),height)
+        return height
+
+    def get_delete_plan(self):
+        """
+        Return the list of the deleting rounds; each round is a list of (model,pks), the rounds are deleted in order.
+        The models without any relationship are deleted before the other models in a round.
+        """
+        heights = {}
+        self._collect(heights)
+        rounds = {}
+        for (model,pk),height in heights.items():
+            rounds.setdefault(height,OrderedDict()).setdefault(model,[]).append(pk)
+        plan = []
+        for height in sorted(rounds.keys()):
+            plan.append(sorted(rounds[height].items(),key=lambda item:(0 if ModelRelationshipTree(item[0]).is_leaf else 1,item[0]._meta.label)))
+        return plan
+
+    def delete(self,batch_size=None,signal_models=None):
+        """
+        Delete the protected objects and the root object in one transaction.
+        The protected objects are deleted round by round with one statement per model per chunk
+            the objects of a model without any relationship are deleted with a raw delete statement and no signal is sent,
+            unless the model is in signal_models; the model cache generation, the search index and the choice cache,
+            which are maintained by the post_delete receivers, are updated explicitly after each chunk
+            the objects of the other models are deleted through the queryset, which cascades the relationships;
+            because the post_delete receivers of django_mvc(cache,search,choices) are registered for all models,
+            the collector can't fast delete them: the objects are loaded and the signals are sent per object
+        The root object is deleted by its own delete method.
+        batch_size: the number of objects deleted by one statement, default is the setting MVC_DELETE_BATCH_SIZE or 500
+        signal_models: the models or the model labels whose pre_delete/post_delete signals are sent, default is the setting MVC_DELETE_SIGNAL_MODELS
+        Return a dict between the model label and the number of the deleted objects, for auditing
+        """
+        batch_size = batch_size or getattr(settings,"MVC_DELETE_BATCH_SIZE",500)
+        if signal_models is None:
+            signal_models = getattr(settings,"MVC_DELETE_SIGNAL_MODELS",None) or []
+        signal_models = set(m if isinstance(m,str) else m._meta.label for m in signal_models)
+
+        summary = OrderedDict()
+        def _add_summary(label,count):
+            if count:
+                summary[label] = summary.get(label,0) + count
 
-    def delete(self):
         with transaction.atomic():
-            self._delete()
-            self.obj.delete()
+            for deleting_round in self.get_delete_plan():
+                for model,pks in deleting_round:
+                    raw_delete = ModelRelationshipTree(model).is_leaf and model._meta.label not in signal_models
+                    for i in range(0,len(pks),batch_size):
+                        queryset = model._base_manager.filter(pk__in=pks[i:i + batch_size])
+                        if raw_delete:
+                            #QuerySet._raw_delete is the fast delete used by the django collector(django 2.2 and later);
+                            #it is safe here because a model without any relationship has nothing to cascade or update
+                            _add_summary(model._meta.label,queryset._raw_delete(queryset.db))
+                            #no post_delete signal is sent
+                            mvc_cache.models_changed(model)
+                            search.unindex(model,pks[i:i + batch_size],using=queryset.db)
+                            choices.model_changed(model)
+                        else:
+                            for label,count in queryset.delete()[1].items():
+                                _add_summary(label,count)
+
+            for label,count in self.obj.delete()[1].items():
+                _add_summary(label,count)
+
+        return summary
 
     empty_line_re= re.compile('\n(\s*\n)+')
     @property
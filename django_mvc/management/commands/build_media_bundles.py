@@ -0,0 +1,17 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from django_mvc import bundles
+
+class Command(BaseCommand):
+    help = "Build the content-hashed static bundles for the html media of all views"
+
+    def handle(self,*args,**options):
+        #import the url configuration to load all view classes
+        import_module(settings.ROOT_URLCONF)
+        from django_mvc.views.views import _viewclasses
+
+        count = bundles.register_views(_viewclasses,write=True)
+        self.stdout.write("{} media bundles are built in {}".format(count,bundles.get_bundle_root()))
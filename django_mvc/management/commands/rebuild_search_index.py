@@ -0,0 +1,43 @@
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand,CommandError
+
+from django_mvc import search
+
+class Command(BaseCommand):
+    help = "Create or rebuild the full-text search indexes of the QFilter search fields"
+
+    def add_arguments(self,parser):
+        parser.add_argument("models",nargs="*",help="The models to rebuild, for example 'auth.User'; rebuild all indexed models if not specified")
+        parser.add_argument("--database",default="default",help="The database to rebuild the indexes")
+        parser.add_argument("--drop",action="store_true",help="Drop the indexes instead of rebuilding them")
+
+    def handle(self,*args,**options):
+        #import the url configuration to load all filter classes
+        import_module(settings.ROOT_URLCONF)
+        search.init_search(sender="rebuild_search_index")
+
+        backend = search.get_backend(options["database"])
+        if not backend:
+            raise CommandError("The full-text search is disabled or not supported by database '{}', please configure MVC_SEARCH_BACKEND".format(options["database"]))
+
+        if options["models"]:
+            models = [apps.get_model(label) for label in options["models"]]
+        else:
+            models = [m for m in apps.get_models() if search.get_search_fields(m)]
+
+        for model in models:
+            if not search.get_search_fields(model):
+                raise CommandError("{} has no indexed search fields".format(model._meta.label))
+            if not backend.supports(model):
+                self.stderr.write("The full-text search of {} is not supported".format(model._meta.label))
+                continue
+            for fields in search.get_search_fields(model):
+                if options["drop"]:
+                    backend.drop(model,fields)
+                    self.stdout.write("The search index of {} on fields {} is dropped".format(model._meta.label,",".join(fields)))
+                else:
+                    count = backend.rebuild(model,fields)
+                    self.stdout.write("{} {} are indexed on fields {}".format(count,model._meta.verbose_name_plural,",".join(fields)))
@@ -0,0 +1,306 @@
+"""
+Local full-text search indexes for the QFilter search fields.
+
+Each distinct set of search fields of a model has its own index; the text of the search fields of a model instance is saved into a shadow index table
+    SQLite: a FTS5 virtual table whose rowid is the primary key of the model
+    PostgreSQL: a table with a tsvector column and a GIN index
+The index is updated by the post_save/post_delete signals, and built or rebuilt by the management command 'rebuild_search_index'.
+Only the QFilters declared with 'indexed=True' are indexed.
+A QFilter searches through the index of its own search fields only if the index table exists; otherwise it falls back to the ORM lookups.
+
+settings:
+    MVC_SEARCH_BACKEND: None: disabled(default); "auto": choose the backend by the database vendor; or the dotted path of a backend class
+    MVC_SEARCH_CONFIG: the text search configuration used by PostgreSQL, default is "simple"
+
+Only the contains lookups (icontains,contains) are searched through the index, the other lookups always use the ORM lookups.
+The search value is split into words which are matched as prefixes, so a word in the middle of a text is not matched.
+The index of a model is not updated if a related object used by a search field path is changed; rebuild it if required.
+"""
+import re
+import time
+import logging
+
+from django.conf import settings
+from django.db import connections,router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save,post_delete
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .signals import system_ready
+from .utils import hashvalue
+
+logger = logging.getLogger(__name__)
+
+#the lookups which can be searched through the full-text index
+TEXT_LOOKUPS = ("icontains","contains")
+
+#the seconds to check again whether a missing index table is created
+TABLE_RECHECK_INTERVAL = 60
+
+word_re = re.compile(r"\w+",re.UNICODE)
+
+#the registered search fields. key is model, value is the list of the tuples of field paths, each tuple has its own index
+_search_fields = {}
+
+_backends = {}
+
+class SearchBackend(object):
+    """
+    The base class of the full-text search backends
+    """
+    vendor = None
+
+    def __init__(self,alias):
+        self.alias = alias
+        self._tables = None
+        self._tables_checked = None
+
+    @property
+    def connection(self):
+        return connections[self.alias]
+
+    def table_name(self,model,fields):
+        return "mvc_fts_{}_{}".format(model._meta.db_table,hashvalue(",".join(fields))[:8])
+
+    def supports(self,model):
+        return True
+
+    def is_ready(self,model,fields):
+        """
+        Return True if the index table of the fields exists.
+        A missing table is checked again after TABLE_RECHECK_INTERVAL seconds, because it can be created by other processes
+        """
+        table = self.table_name(model,fields)
+        if self._tables is not None and table not in self._tables and time.time() - self._tables_checked > TABLE_RECHECK_INTERVAL:
+            self._tables = None
+        if self._tables is None:
+            with self.connection.cursor() as cursor:
+                self._tables = set(self.connection.introspection.table_names(cursor))
+            self._tables_checked = time.time()
+        return table in self._tables
+
+    def create(self,model,fields):
+        raise NotImplementedError()
+
+    def drop(self,model,fields):
+        table = self.connection.ops.quote_name(self.table_name(model,fields))
+        with self.connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS {}".format(table))
+        self._tables = None
+
+    def update(self,model,fields,rows):
+        """
+        Insert or update the index
+        rows: a list of (pk,document)
+        """
+        raise NotImplementedError()
+
+    def delete(self,model,fields,pks):
+        """
+        Remove the rows from the index
+        pks: a list of pks
+        """
+        raise NotImplementedError()
+
+    def search_sql(self,model,fields,words):
+        """
+        Return (sql,params) which selects the pks of the rows matching all the words
+        """
+        raise NotImplementedError()
+
+    def rebuild(self,model,fields,batch_size=1000):
+        """
+        Recreate the index table of the fields and index all the rows
+        Return the number of indexed rows
+        """
+        self.drop(model,fields)
+        self.create(model,fields)
+        count = 0
+        rows = []
+        queryset = model._default_manager.using(self.alias).order_by("pk")
+        for obj in queryset.iterator(chunk_size=batch_size):
+            rows.append((obj.pk,get_document(obj,fields)))
+            if len(rows) >= batch_size:
+                self.update(model,fields,rows)
+                count += len(rows)
+                rows = []
+        if rows:
+            self.update(model,fields,rows)
+            count += len(rows)
+        return count
+
+class SqliteBackend(SearchBackend):
+    """
+    Save the index into a FTS5 virtual table
+    """
+    vendor = "sqlite"
+
+    def supports(self,model):
+        #the rowid of the fts5 table is the primary key of the model
+        return model._meta.pk.get_internal_type() in ("AutoField","BigAutoField","IntegerField","BigIntegerField","SmallIntegerField","PositiveIntegerField")
+
+    def create(self,model,fields):
+        table = self.connection.ops.quote_name(self.table_name(model,fields))
+        with self.connection.cursor() as cursor:
+            cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS {} USING fts5(document, tokenize='unicode61')".format(table))
+        self._tables = None
+
+    def update(self,model,fields,rows):
+        table = self.connection.ops.quote_name(self.table_name(model,fields))
+        with self.connection.cursor() as cursor:
+            cursor.executemany("DELETE FROM {} WHERE rowid = %s".format(table),[(pk,) for pk,document in rows])
+            cursor.executemany("INSERT INTO {}(rowid,document) VALUES (%s,%s)".format(table),rows)
+
+    def delete(self,model,fields,pks):
+        table = self.connection.ops.quote_name(self.table_name(model,fields))
+        with self.connection.cursor() as cursor:
+            cursor.executemany("DELETE FROM {} WHERE rowid = %s".format(table),[(pk,) for pk in pks])
+
+    def search_sql(self,model,fields,words):
+        table = self.connection.ops.quote_name(self.table_name(model,fields))
+        return ("SELECT rowid FROM {0} WHERE {0} MATCH %s".format(table),[" ".join('"{}"*'.format(w) for w in words)])
+
+class PostgresBackend(SearchBackend):
+    """
+    Save the index into a table with a tsvector column and a GIN index
+    """
+    vendor = "postgresql"
+
+    @property
+    def config(self):
+        return getattr(settings,"MVC_SEARCH_CONFIG","simple")
+
+    def create(self,model,fields):
+        table = self.table_name(model,fields)
+        qn = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            cursor.execute("CREATE TABLE IF NOT EXISTS {} (id {} PRIMARY KEY, document tsvector NOT NULL)".format(qn(table),model._meta.pk.rel_db_type(connection=self.connection)))
+            cursor.execute("CREATE INDEX IF NOT EXISTS {} ON {} USING GIN (document)".format(qn("{}_document".format(table)),qn(table)))
+        self._tables = None
+
+    def update(self,model,fields,rows):
+        table = self.connection.ops.quote_name(self.table_name(model,fields))
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO {} (id,document) VALUES (%s,to_tsvector(%s,%s)) ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document".format(table),
+                [(pk,self.config,document) for pk,document in rows]
+            )
+
+    def delete(self,model,fields,pks):
+        table = self.connection.ops.quote_name(self.table_name(model,fields))
+        with self.connection.cursor() as cursor:
+            cursor.executemany("DELETE FROM {} WHERE id = %s".format(table),[(pk,) for pk in pks])
+
+    def search_sql(self,model,fields,words):
+        table = self.connection.ops.quote_name(self.table_name(model,fields))
+        return ("SELECT id FROM {} WHERE document @@ to_tsquery(%s,%s)".format(table),[self.config," & ".join("{}:*".format(w) for w in words)])
+
+backend_classes = {
+    "sqlite":SqliteBackend,
+    "postgresql":PostgresBackend
+}
+
+def get_backend(alias="default"):
+    """
+    Return the search backend of the database; return None if full-text search is disabled or not supported
+    """
+    try:
+        return _backends[alias]
+    except KeyError:
+        pass
+    setting = getattr(settings,"MVC_SEARCH_BACKEND",None)
+    if not setting:
+        backend = None
+    elif setting == "auto":
+        cls = backend_classes.get(connections[alias].vendor)
+        backend = cls(alias) if cls else None
+    else:
+        backend = import_string(setting)(alias)
+    _backends[alias] = backend
+    return backend
+
+def register(model,fields):
+    """
+    Index the field paths of the model; each distinct set of field paths has its own index
+    """
+    fields = tuple(fields)
+    registered = _search_fields.setdefault(model,[])
+    if fields not in registered:
+        registered.append(fields)
+
+def get_search_fields(model):
+    """
+    Return the list of the indexed tuples of field paths of the model
+    """
+    return _search_fields.get(model)
+
+def _get_value(obj,path):
+    for name in path.split("__"):
+        if obj is None:
+            return None
+        obj = getattr(obj,name,None)
+        if callable(obj):
+            obj = obj()
+    return obj
+
+def get_document(obj,fields):
+    """
+    Return the indexed text of the fields of the model instance
+    """
+    values = (_get_value(obj,path) for path in fields)
+    return " ".join(str(v) for v in values if v not in (None,""))
+
+def split_words(value):
+    return word_re.findall(value)
+
+def search_q(queryset,value,fields):
+    """
+    Return a filter which matches the rows whose search fields contain the words in value through the full-text index;
+    return None if the index is not available
+    """
+    model = queryset.model
+    fields = tuple(fields)
+    if fields not in (_search_fields.get(model) or []):
+        return None
+    backend = get_backend(queryset.db)
+    if not backend or not backend.supports(model) or not backend.is_ready(model,fields):
+        return None
+    words = split_words(value)
+    if not words:
+        return None
+    sql,params = backend.search_sql(model,fields,words)
+    return Q(pk__in=RawSQL(sql,params))
+
+@receiver(post_save)
+def _index_instance(sender,instance,raw=False,using=None,**kwargs):
+    if raw or sender not in _search_fields:
+        return
+    backend = get_backend(using or router.db_for_write(sender))
+    if backend and backend.supports(sender):
+        for fields in _search_fields[sender]:
+            if backend.is_ready(sender,fields):
+                backend.update(sender,fields,[(instance.pk,get_document(instance,fields))])
+
+def unindex(model,pks,using=None):
+    """
+    Remove the rows from the indexes of the model.
+    Called explicitly if the rows are deleted without sending the post_delete signals
+    """
+    if model not in _search_fields or not pks:
+        return
+    backend = get_backend(using or router.db_for_write(model))
+    if backend and backend.supports(model):
+        for fields in _search_fields[model]:
+            if backend.is_ready(model,fields):
+                backend.delete(model,fields,pks)
+
+@receiver(post_delete)
+def _unindex_instance(sender,instance,using=None,**kwargs):
+    unindex(sender,[instance.pk],using=using)
+
+@receiver(system_ready)
+def init_search(sender,**kwargs):
+    from .forms.filters import register_search_fields
+    register_search_fields()
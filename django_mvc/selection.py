@@ -0,0 +1,253 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+from django.utils.crypto import get_random_string
+from django.utils.datastructures import MultiValueDict
+
+#the request parameters which are not part of the filter snapshot
+_ignored_parameters = ("csrfmiddlewaretoken","selectedpks","excludedpks","select_all","selection","action__","nexturl")
+
+def compress_pks(pks):
+    """
+    Compress a collection of integer pks into a sorted list of [start,end] ranges
+    """
+    ranges = []
+    for pk in sorted(set(pks)):
+        if ranges and ranges[-1][1] + 1 == pk:
+            ranges[-1][1] = pk
+        else:
+            ranges.append([pk,pk])
+    return ranges
+
+def expand_pks(ranges):
+    """
+    Expand the [start,end] ranges into a list of pks
+    """
+    pks = []
+    for start,end in ranges:
+        pks.extend(range(start,end + 1))
+    return pks
+
+def ranges_count(ranges):
+    return sum(end - start + 1 for start,end in ranges)
+
+def ranges_contains(ranges,pk):
+    for start,end in ranges:
+        if pk < start:
+            return False
+        elif pk <= end:
+            return True
+    return False
+
+def ranges_q(ranges,field="pk"):
+    """
+    Return a Q object to filter the rows whose pks are in the ranges
+    """
+    q = None
+    for start,end in ranges:
+        if start == end:
+            r = Q(**{field:start})
+        else:
+            r = Q(**{"{}__gte".format(field):start,"{}__lte".format(field):end})
+        q = r if q is None else (q | r)
+    return q
+
+class InvalidSelection(Exception):
+    """
+    Raised if the selection token is invalid, expired or already used
+    """
+    pass
+
+class SessionSelectionStore(object):
+    """
+    Save the selection sets in the user session.
+    The selection sets expire after SELECTION_TIMEOUT seconds, and at most SELECTION_MAX_TOKENS selection sets are kept; the oldest is removed first.
+    """
+    key = "mvc_selections"
+    def __init__(self):
+        self.timeout = getattr(settings,"SELECTION_TIMEOUT",3600)
+        self.max_tokens = getattr(settings,"SELECTION_MAX_TOKENS",20)
+
+    def _selections(self,request):
+        """
+        Return the dict between the token and [expire time,data] after removing the expired selection sets
+        """
+        selections = request.session.get(self.key) or {}
+        now = time.time()
+        expired = [token for token,(expire_time,data) in selections.items() if expire_time < now]
+        if expired:
+            for token in expired:
+                del selections[token]
+            request.session[self.key] = selections
+        return selections
+
+    def get(self,request,token):
+        selection = self._selections(request).get(token)
+        return selection[1] if selection else None
+
+    def set(self,request,token,data):
+        selections = self._selections(request)
+        selections[token] = [time.time() + self.timeout,data]
+        if len(selections) > self.max_tokens:
+            for token,selection in sorted(selections.items(),key=lambda item:item[1][0])[:len(selections) - self.max_tokens]:
+                del selections[token]
+        request.session[self.key] = selections
+
+    def delete(self,request,token):
+        selections = self._selections(request)
+        if token in selections:
+            del selections[token]
+            request.session[self.key] = selections
+
+class CacheSelectionStore(object):
+    """
+    Save the selection sets in the django cache
+    """
+    prefix = "mvc_selection_"
+    def __init__(self):
+        self.cache = caches[getattr(settings,"SELECTION_CACHE","default")]
+        self.timeout = getattr(settings,"SELECTION_TIMEOUT",3600)
+
+    def _key(self,request,token):
+        #bind the selection set to the user to prevent a token from being used by others
+        return "{}{}_{}".format(self.prefix,request.user.pk if request.user.is_authenticated else "",token)
+
+    def get(self,request,token):
+        return self.cache.get(self._key(request,token))
+
+    def set(self,request,token,data):
+        self.cache.set(self._key(request,token),data,self.timeout)
+
+    def delete(self,request,token):
+        self.cache.delete(self._key(request,token))
+
+_store = None
+def get_store():
+    global _store
+    if _store is None:
+        if getattr(settings,"SELECTION_STORE","session") == "cache":
+            _store = CacheSelectionStore()
+        else:
+            _store = SessionSelectionStore()
+    return _store
+
+class SelectionSet(object):
+    """
+    A server side selection set which is stored in session or cache and referenced by a short token.
+    filter: the snapshot of the filter form data if all rows matching the filter are selected; otherwise None
+    includes: the ranges of the selected pks besides the filter
+    excludes: the ranges of the deselected pks from the filter
+    """
+    def __init__(self,model,filter=None,includes=None,excludes=None,token=None):
+        self.model = model
+        self.filter = filter
+        self.includes = includes or []
+        self.excludes = excludes or []
+        self.token = token
+
+    @property
+    def select_all(self):
+        return self.filter is not None
+
+    @property
+    def filter_data(self):
+        return MultiValueDict(self.filter) if self.filter is not None else None
+
+    def __contains__(self,pk):
+        if ranges_contains(self.excludes,pk):
+            return False
+        elif self.select_all:
+            return True
+        else:
+            return ranges_contains(self.includes,pk)
+
+    def __bool__(self):
+        #__len__ can't be used, because the number of selected rows is unknown if all rows matching the filter are selected
+        return not self.is_empty
+
+    def __len__(self):
+        if self.select_all:
+            raise Exception("The number of selected rows is unknown if all rows matching the filter are selected")
+        return ranges_count(self.includes)
+
+    @property
+    def is_empty(self):
+        return not self.select_all and not self.includes
+
+    @property
+    def pks(self):
+        """
+        Return the list of selected pks; return None if all rows matching the filter are selected
+        """
+        if self.select_all:
+            return None
+        pks = expand_pks(self.includes)
+        if self.excludes:
+            pks = [pk for pk in pks if not ranges_contains(self.excludes,pk)]
+        return pks
+
+    def filter_queryset(self,queryset):
+        """
+        Apply the include and exclude deltas to the queryset.
+        queryset should be already filtered by the filter snapshot if all rows matching the filter are selected
+        """
+        if self.select_all:
+            if self.includes:
+                queryset = queryset | queryset.model.objects.filter(ranges_q(self.includes))
+        elif self.includes:
+            queryset = queryset.filter(ranges_q(self.includes))
+        else:
+            return queryset.none()
+
+        if self.excludes:
+            queryset = queryset.exclude(ranges_q(self.excludes))
+
+        return queryset
+
+    def save(self,request):
+        if not self.token:
+            self.token = get_random_string(12)
+        get_store().set(request,self.token,{
+            "model":self.model._meta.label_lower,
+            "filter":self.filter,
+            "includes":self.includes,
+            "excludes":self.excludes
+        })
+        return self.token
+
+    @classmethod
+    def load(cls,request,model,token,consume=False):
+        """
+        Load the selection set saved with the token; raise InvalidSelection if the token is invalid or expired.
+        consume: if True, the token can't be used again; the selection set should be saved again if required.
+        """
+        store = get_store()
+        data = store.get(request,token)
+        if not data:
+            raise InvalidSelection("The selection has expired, please select the {} again.".format(model._meta.verbose_name_plural))
+        if data["model"] != model._meta.label_lower:
+            raise InvalidSelection("The selection is not a {} selection.".format(model._meta.verbose_name))
+        if consume:
+            store.delete(request,token)
+        return cls(model,filter=data["filter"],includes=data["includes"],excludes=data["excludes"],token=token)
+
+    @classmethod
+    def from_request(cls,request,model,data,pk=None):
+        """
+        Create a selection set from the request parameters; return None if nothing is selected
+        The token of a saved selection set is consumed by a POST request.
+        """
+        if data.get("selection"):
+            return cls.load(request,model,data.get("selection"),consume=request.method == "POST")
+        elif data.get("select_all") == "true":
+            snapshot = dict((k,data.getlist(k)) for k in data.keys() if k not in _ignored_parameters)
+            return cls(model,filter=snapshot,excludes=compress_pks(int(pk) for pk in data.getlist("excludedpks")))
+        elif "selectedpks" in data:
+            return cls(model,includes=compress_pks(int(pk) for pk in data.getlist("selectedpks")))
+        elif pk is not None:
+            return cls(model,includes=[[int(pk),int(pk)]])
+        else:
+            return None
+
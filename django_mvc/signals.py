@@ -18,3 +18,6 @@ views_inited = django.dispatch.Signal()
 
 system_ready = django.dispatch.Signal()
 
+#sent when a group is created, changed or deleted. providing_args=["group"]
+groups_changed = django.dispatch.Signal()
+
@@ -0,0 +1,49 @@
+//Load the next rows of the list page when the user scrolls to the end of the list, instead of paging.
+//The table body declares
+//  data-rows-next: the url of the next rows, which returns {"rows":[{"pk":pk,"html":[column html,...],"selected":true/false}],"next":url of the next rows}
+//  data-rows-selector: the name of the list selector if the rows are selectable
+(function($) {
+    var appendRows = function(tbody,rows) {
+        var selector = tbody.attr("data-rows-selector")
+        $.each(rows,function(i,row) {
+            var tr = $("<tr></tr>")
+            if (selector) {
+                var checkbox = $('<input type="checkbox" name="selectedpks">').val(row.pk).prop("checked",row.selected === true)
+                checkbox.on("click",function(ev) {
+                    window[selector + "_selector"].select(this.checked)
+                    ev.stopPropagation()
+                })
+                tr.append($("<td></td>").append(checkbox))
+            }
+            tr.append(row.html.join(""))
+            tbody.append(tr)
+        })
+    }
+
+    var loadRows = function(tbody) {
+        var url = tbody.attr("data-rows-next")
+        if (!url || tbody.data("loading")) {
+            return
+        }
+        tbody.data("loading",true)
+        $.ajax({url:url,dataType:"json",headers:{Accept:"application/json"}}).done(function(data) {
+            appendRows(tbody,data.rows)
+            tbody.attr("data-rows-next",data.next || "")
+        }).always(function() {
+            tbody.data("loading",false)
+        })
+    }
+
+    var checkRows = function() {
+        var bottom = $(window).scrollTop() + $(window).height()
+        $("tbody[data-rows-next]").each(function() {
+            var tbody = $(this)
+            if (tbody.attr("data-rows-next") && tbody.offset().top + tbody.outerHeight() - bottom < 200) {
+                loadRows(tbody)
+            }
+        })
+    }
+
+    $(window).on("scroll resize",checkRows)
+    $(checkRows)
+})(jQuery);
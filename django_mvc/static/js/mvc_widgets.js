@@ -0,0 +1,183 @@
+//The shared initialiser of the django_mvc widgets.
+//The widgets only declare their behaviour with data-* attributes; this script attaches the behaviour through event delegation.
+//
+//switch widgets:
+//  data-switch-target: the selector of the html elements to show/hide
+//  data-switch-value: the value to show the target; not required for checkbox
+//  data-switch-reverse: hide the target if the value is equal with switch value
+//  data-switch-disable: the selector of the form fields which are disabled when the target is hidden
+//plugin widgets:
+//  data-mvc-widget: the name of the initialiser, the widget is initialised once when it is added into the document.
+//  data-mvc-lazy: initialise the widget when it is focused the first time instead of when it is added into the document.
+//  data-mvc-options: the json options passed to the initialiser
+//  the autocomplete widgets use select2 to fetch the options from the autocomplete view, options: {url:the url of the autocomplete view}
+//dirty rows only formsets:
+//  data-dirty-rows: the prefix of the formset; only the changed rows and the new rows are submitted,
+//  the indexes of the changed rows are set into the marked hidden input when the form is submitted.
+var mvcWidgets = (function($) {
+    var initialisers = {
+        datetimepicker: function(element,options) {
+            $(element).datetimepicker(options || {})
+            if (document.activeElement === element) {
+                //initialised lazily when the input is focused
+                $(element).datetimepicker("show")
+            }
+        },
+        selectpicker: function(element,options) {
+            $(element).selectpicker(options || {})
+        },
+        select2: function(element,options) {
+            $(element).djangoSelect2(options || {})
+        },
+        autocomplete: function(element,options) {
+            //fetch the options page by page from the autocomplete view
+            $(element).select2({
+                ajax:{url:options.url,dataType:"json",delay:250},
+                allowClear:!element.multiple && !element.required,
+                placeholder:options.placeholder || "",
+                width:"resolve"
+            })
+        },
+        selectfilter: function(element,options) {
+            var data = $(element).data()
+            SelectFilter.init(element.id, data.fieldName, parseInt(data.isStacked, 10))
+        },
+        multiselect: function(element,options) {
+            options = $.extend({buttonClass:"btn btn-small",checkboxName:element.id},options || {})
+            if (options.buttonText !== undefined && options.buttonText !== null) {
+                var text = options.buttonText
+                options.buttonText = function() {return text;}
+            }
+            $(element).multiselect(options)
+        }
+    }
+
+    var isTemplate = function(element) {
+        return element.id && element.id.indexOf("__prefix__") >= 0
+    }
+
+    var initWidget = function(element) {
+        if (element.mvcInitialised || isTemplate(element)) {
+            return
+        }
+        element.mvcInitialised = true
+        var initialiser = initialisers[element.getAttribute("data-mvc-widget")]
+        if (initialiser) {
+            var options = element.getAttribute("data-mvc-options")
+            initialiser(element,options ? JSON.parse(options) : null)
+        }
+    }
+
+    var applySwitch = function(element) {
+        var $element = $(element)
+        var on = null
+        if (element.type === "checkbox") {
+            on = element.checked
+        } else if (element.type === "radio") {
+            if (!element.checked) {
+                return
+            }
+            on = element.value === String($element.attr("data-switch-value"))
+        } else {
+            on = $element.val() === String($element.attr("data-switch-value"))
+        }
+        if ($element.attr("data-switch-reverse") === "true") {
+            on = !on
+        }
+        $($element.attr("data-switch-target")).toggle(on)
+        var disable = $element.attr("data-switch-disable")
+        if (disable) {
+            $(disable).prop("disabled",!on)
+        }
+    }
+
+    var init = function(root) {
+        var $root = $(root || document)
+        $root.find("[data-mvc-widget]").addBack("[data-mvc-widget]").not("[data-mvc-lazy]").each(function() {
+            initWidget(this)
+        })
+        $root.find("[data-switch-target]").addBack("[data-switch-target]").each(function() {
+            applySwitch(this)
+        })
+    }
+
+    $(document).on("click change","[data-switch-target]",function() {
+        applySwitch(this)
+    })
+
+    //return the row index of the formset input; return null if the input doesn't belong to the formset
+    var rowIndex = function(prefix,name) {
+        if (!name || name.indexOf(prefix + "-") !== 0) {
+            return null
+        }
+        var match = /^(\d+)-/.exec(name.substring(prefix.length + 1))
+        return match ? parseInt(match[1],10) : null
+    }
+
+    $(document).on("change",":input",function() {
+        var element = this
+        $(element.form).find("input[data-dirty-rows]").each(function() {
+            var index = rowIndex(this.getAttribute("data-dirty-rows"),element.name)
+            if (index !== null) {
+                this.mvcDirtyRows = this.mvcDirtyRows || {}
+                this.mvcDirtyRows[index] = true
+            }
+        })
+    })
+    $(document).on("submit","form",function() {
+        var form = this
+        $(form).find("input[data-dirty-rows]").each(function() {
+            var prefix = this.getAttribute("data-dirty-rows")
+            var rows = this.mvcDirtyRows || {}
+            var initialForms = parseInt($(form).find("input[name='" + prefix + "-INITIAL_FORMS']").val(),10)
+            $(form).find(":input").each(function() {
+                var index = rowIndex(prefix,this.name)
+                if (index !== null && index < initialForms && !rows[index]) {
+                    //the unchanged row is not submitted
+                    this.disabled = true
+                    this.mvcUnchangedRow = true
+                }
+            })
+            this.value = Object.keys(rows).join(",")
+        })
+    })
+    $(window).on("pageshow",function() {
+        //enable the unchanged rows again if the page is restored from the browser cache
+        $("input[data-dirty-rows]").each(function() {
+            var prefix = this.getAttribute("data-dirty-rows")
+            this.value = "*"
+            $(this.form).find(":input:disabled").each(function() {
+                if (this.mvcUnchangedRow) {
+                    this.disabled = false
+                    this.mvcUnchangedRow = false
+                }
+            })
+        })
+    })
+    $(document).on("focusin mouseenter","[data-mvc-lazy]",function() {
+        initWidget(this)
+    })
+
+    $(function() {
+        init(document)
+        //initialise the widgets in the rows added to the formsets.
+        if (window.MutationObserver) {
+            new MutationObserver(function(mutations) {
+                $.each(mutations,function(i,mutation) {
+                    $.each(mutation.addedNodes,function(j,node) {
+                        if (node.nodeType === 1) {
+                            init(node)
+                        }
+                    })
+                })
+            }).observe(document.body,{childList:true,subtree:true})
+        }
+    })
+
+    return {
+        init:init,
+        register:function(name,initialiser) {
+            initialisers[name] = initialiser
+        }
+    }
+})(jQuery);
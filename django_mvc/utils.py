@@ -3,11 +3,14 @@ import imp
 import sys
 import os
 import inspect
+import logging
 
 from django.db import models
 from django.http.request import (QueryDict,)
 from django.utils.datastructures import (MultiValueDict,)
 
+logger = logging.getLogger(__name__)
+
 def getclassmethodargs(cls,method_name,processed_classes=None):
     func_kwonlyargs = []
     func_args = []
@@ -338,7 +341,7 @@ def load_module(name,base_path="."):
     # If any of the following calls raises an exception,
     # there's a problem we can't handle -- let the caller handle it.
 
-    print("find module {}:{}".format(filename,path))
+    logger.debug("find module %s:%s",filename,path)
     fp, pathname, description = imp.find_module(filename,[path])
 
     try:
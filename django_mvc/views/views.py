@@ -1,15 +1,18 @@
 import re
 import traceback
+import logging
 from urllib import parse
 
-from django.core.exceptions import ImproperlyConfigured,NON_FIELD_ERRORS
+from django.core.exceptions import ImproperlyConfigured,ValidationError,NON_FIELD_ERRORS
 from django.urls import path 
 from django.contrib import messages
-from django.http import (Http404,HttpResponse,HttpResponseForbidden,JsonResponse,HttpResponseRedirect)
+from django.http import (Http404,HttpResponse,HttpResponseBadRequest,HttpResponseForbidden,JsonResponse,HttpResponseRedirect)
 import django.views.generic.edit as django_edit_view
 import django.views.generic.list as django_list_view
-from django.db import transaction
+from django.db import transaction,models
+from django.db.models import Q
 from django.core.serializers.json import DjangoJSONEncoder
+from django.core import signing
 from django.dispatch import receiver
 from django import template
 
@@ -17,14 +20,34 @@ from urllib.parse import quote
 
 from django_mvc.forms.utils import ChainDict,Media
 from django_mvc.forms.formsets import FormSet
-from django_mvc.forms.forms import RequestUrlMixin
+from django_mvc.forms.forms import RequestUrlMixin,ConcurrentUpdateError
 from django_mvc.forms.listform import ListForm,ConfirmMixin
 from django_mvc.inspectmodel import (ObjectDependencyTree,ModelDependencyTree)
+from django_mvc.selection import SelectionSet,InvalidSelection
 import django_mvc.actions
 from django_mvc.signals import formsets_inited,system_ready
 from django_mvc import classproperty
+from django_mvc import cache as mvc_cache
+from django_mvc import bundles
+from django_mvc.utils import hashvalue
+
+logger = logging.getLogger(__name__)
 
 _viewclasses = []
+
+def _batches(iterable,size):
+    """
+    Split the iterable into lists with at most size members
+    """
+    batch = []
+    for o in iterable:
+        batch.append(o)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 class ViewInitMixin(object):
     @classmethod
     def post_init(cls):
@@ -52,7 +75,7 @@ class ViewInitMixin(object):
                     template_name = cls.default_template_name
 
                 cls.template_names = [template_name]
-                print("{0}: set template to {1}".format(cls,template_name))
+                logger.debug("%s: set template to %s",cls,template_name)
 
             for action_template_prop,action_template_pattern,default_action_template in [
                     ("deleteconfirm_template","{}/{}_deleteconfirm.html","deleteconfirm.html"),
@@ -73,7 +96,7 @@ class ViewInitMixin(object):
                         action_template = default_action_template
 
                     setattr(cls,"{}s".format(action_template_prop),[action_template])
-                    print("{0}: set {1} to {2}".format(cls,action_template_prop,action_template))
+                    logger.debug("%s: set %s to %s",cls,action_template_prop,action_template)
                     
         except:
            traceback.print_exc()
@@ -635,6 +658,30 @@ class RequestUrl(object):
             
         return self._nexturl
 
+    def canonical_querystring(self,defaults=None):
+        """
+        Return a canonical query string which can be used as a cache key
+        the parameters are sorted, the empty parameters and the parameters with default value are stripped.
+        defaults: a dict of parameter name to default value
+        """
+        params = []
+        for k,v in parse.parse_qsl(self.request.META.get("QUERY_STRING",""),keep_blank_values=False):
+            if defaults and k in defaults and str(defaults[k]) == v:
+                continue
+            params.append((k,v))
+        params.sort()
+        return parse.urlencode(params)
+
+    def replace_querystring(self,excludes=None,**kwargs):
+        """
+        Return a query string with the new parameter values
+        excludes: the parameters which are removed from the query string
+        kwargs: the parameters which are added into the query string
+        """
+        params = [(k,v) for k,v in parse.parse_qsl(self.request.META.get("QUERY_STRING",""),keep_blank_values=True) if k not in kwargs and (not excludes or k not in excludes)]
+        params.extend((k,v) for k,v in kwargs.items() if v is not None)
+        return "?{}".format(parse.urlencode(params))
+
     def get_querystring(self,paramname,paramvalue=None):
         """
         return if paramvalue is None, return the new querystring without the request parameter spefified by paramname
@@ -706,14 +753,20 @@ class HtmlMediaMixin(object):
     def get_mediaforms(self):
         return (self.get_form_class(),)
 
+    @staticmethod
+    def combine_media(mediaforms):
+        media = Media()
+        for mediaform in mediaforms:
+            media += mediaform.media
+        return media
+
     def add_htmlmedia_context(self,context):
         mediaforms = self.get_mediaforms()
         try:
             context["htmlmedia"] = self.medias[mediaforms]
         except:
-            media = Media()
-            for mediaform in mediaforms:
-                media += mediaform.media
+            #use the static bundle if registered
+            media = bundles.get(mediaforms) or self.combine_media(mediaforms)
             self.medias[mediaforms] = media
             context["htmlmedia"] = media
 
@@ -883,6 +936,40 @@ class EditView(ErrorMixin,HtmlMediaMixin,UrlpatternsMixin,NextUrlMixin,FormMixin
         RequestActionMixin,UserMessageMixin,UserMixin,ViewInitMixin,django_edit_view.UpdateView,metaclass=ViewMetaclass):
     title = None
     default_post_action ="save"
+    #if True, a signed snapshot of the original values is posted with the data, and the object is updated 
+    #through a conditional update statement without loading it from database.
+    #fall back to the normal way if the form class doesn't support it.
+    conditional_update = False
+    snapshot_parameter = "snapshot__"
+    #the ConcurrentUpdateError raised by a invalid or expired snapshot; the object is loaded from database but can't be saved
+    snapshot_error = None
+
+    def is_conditional_update(self):
+        return self.conditional_update and self.get_form_class().can_update_conditionally()
+
+    def get_object(self,queryset=None):
+        if self.request.method == "POST" and self.snapshot_parameter in self.request.POST and self.is_conditional_update():
+            try:
+                return self.get_form_class().instance_from_snapshot(self.request.POST[self.snapshot_parameter],self.kwargs.get(self.pk_url_kwarg))
+            except ConcurrentUpdateError as ex:
+                #invalid or expired snapshot, load the object from database to render the form again
+                self.snapshot_error = ex
+        return super(EditView,self).get_object(queryset)
+
+    def get_form(self,form_class=None):
+        form = super(EditView,self).get_form(form_class)
+        if getattr(form.instance,"_snapshot",None) is not None:
+            form.snapshot_queryset = self.get_queryset()
+        return form
+
+    def form_valid(self,form):
+        try:
+            if self.snapshot_error:
+                raise self.snapshot_error
+            return super(EditView,self).form_valid(form)
+        except ConcurrentUpdateError as ex:
+            form.add_error(None,str(ex))
+            return self.form_invalid(form)
 
     def get_form_kwargs(self):
         kwargs = super(EditView,self).get_form_kwargs()
@@ -894,6 +981,13 @@ class EditView(ErrorMixin,HtmlMediaMixin,UrlpatternsMixin,NextUrlMixin,FormMixin
     def get_context_data(self,**kwargs):
         context = super(EditView,self).get_context_data(**kwargs)
         context["title"] = self.title or "Update {}".format(self.model._meta.verbose_name)
+        if self.is_conditional_update():
+            context["snapshot_parameter"] = self.snapshot_parameter
+            if self.request.method == "POST" and self.snapshot_parameter in self.request.POST and not self.snapshot_error:
+                #post the original snapshot again
+                context["snapshot"] = self.request.POST[self.snapshot_parameter]
+            else:
+                context["snapshot"] = context["form"].get_snapshot()
         self.update_context_data(context)
         self.post_update_context_data(context)
         return context
@@ -985,17 +1079,72 @@ class ManyToManyModelMixin(ParentObjectMixin):
 
         return obj
             
+    #True: synchronize the relationship through the related manager's remove/add which send the m2m_changed signals
+    #False: manipulate the through table directly if it is auto created, no m2m_changed signals are sent; the cache generations are bumped explicitly
+    select_with_signals = True
+    select_batch_size = 500
+
+    def get_selectable_queryset(self):
+        """
+        Return the queryset from which the user can select the rows
+        """
+        return self.model.objects.all()
+
     def select_post(self):
+        """
+        Synchronize the many to many relationship with the selected rows.
+        Only the difference between the current rows and the selected rows is removed or added.
+        If all rows matching the filter are selected, the selected pks are never loaded; a subquery is used instead.
+        """
         selected_ids = self.get_selected_ids()
+        manager = getattr(self.pobject,self.many_to_many_field_name)
+        through = manager.through
+        use_through = not self.select_with_signals and through._meta.auto_created
+
+        with transaction.atomic():
+            if selected_ids is None:
+                #select all rows matching the filter
+                #the rows included besides the filter are not restricted by the selectable queryset, restrict them again
+                selectable = self.get_selectable_queryset()
+                selected = selectable.filter(pk__in=self.get_queryset_4_selected(selectable).order_by().values("pk")).order_by().values("pk")
+                if use_through:
+                    removed = None
+                else:
+                    removed = list(manager.exclude(pk__in=selected).values_list("pk",flat=True))
+                #only the pks which are not related yet are loaded
+                added = list(selected.exclude(pk__in=manager.order_by().values("pk")).values_list("pk",flat=True))
+            else:
+                selected = set(selected_ids)
+                current = set(manager.values_list("pk",flat=True))
+                removed = current - selected
+                added = selected - current
+                if added:
+                    #ignore the pks which are not selectable
+                    added = list(self.get_selectable_queryset().filter(pk__in=added).values_list("pk",flat=True))
+
+            if use_through:
+                source_filter = {manager.source_field_name:self.pobject}
+                target_in = "{}__in".format(manager.target_field_name)
+                if removed is None:
+                    through.objects.filter(**source_filter).exclude(**{target_in:selected}).delete()
+                else:
+                    for pks in _batches(removed,self.select_batch_size):
+                        through.objects.filter(**source_filter).filter(**{target_in:pks}).delete()
 
-        #remove previous selected but not selected rows.
-        for o in getattr(self.pobject,self.many_to_many_field_name).all().exclude(pk__in=selected_ids):
-            getattr(self.pobject,self.many_to_many_field_name).remove(o)
-        
+                source_attname = "{}_id".format(manager.source_field_name)
+                target_attname = "{}_id".format(manager.target_field_name)
+                for pks in _batches(added,self.select_batch_size):
+                    through.objects.bulk_create([through(**{source_attname:self.pobject.pk,target_attname:pk}) for pk in pks])
+            else:
+                for pks in _batches(removed,self.select_batch_size):
+                    manager.remove(*pks)
+
+                for pks in _batches(added,self.select_batch_size):
+                    manager.add(*pks)
 
-        #add new selected rows
-        for o in self.model.objects.filter(pk__in=selected_ids).exclude(**{self.related_field_name:self.pobject}):
-            getattr(self.pobject,self.many_to_many_field_name).add(o)
+        if use_through:
+            #no m2m_changed signal is sent when the through table is changed directly
+            mvc_cache.models_changed(self.pobject.__class__,self.model,through)
 
         return HttpResponseRedirect(self.get_success_url())
 
@@ -1011,6 +1160,61 @@ class ListBaseView(UrlpatternsMixin,ModelMixin,RequestActionMixin,UserMessageMix
 
     order_mapping = None
 
+    #the timeout of the cached list page; the list page is not cached if it is None
+    cache_timeout = None
+    #the other models shown in the list page, the cached list page is invalidated if any of these models is changed
+    cache_dependent_models = None
+    #if True, the cached list page is only shared by the same user, because the page contains user related data (login user, csrf token);
+    #if False, the cached list page is shared by all users with the same permissions.
+    cache_vary_on_user = True
+
+    #the request parameter to return the rows of a page in json format, for example "format=json"
+    format_parameter = "format"
+    #the request parameter to return the rows after the keyset cursor
+    cursor_parameter = "cursor"
+    #the content of the json rows: "html" the rendered html columns of the list form; "values" the values of the list form fields
+    json_rows = "html"
+    #if True, the list page loads the next rows when the user scrolls to the end of the list instead of paging
+    infinite_scroll = False
+
+    @classmethod
+    def post_init(cls):
+        super(ListBaseView,cls).post_init()
+        if cls.cache_timeout and getattr(cls,"model",None):
+            mvc_cache.register_model(cls.model)
+            for model in cls.cache_dependent_models or []:
+                mvc_cache.register_model(model)
+        filterform_class = cls.filterform_class
+        if getattr(cls,"model",None) and filterform_class and getattr(filterform_class,"facet_fields",None) and filterform_class.facet_cache_timeout:
+            #the cached facet counts are invalidated by the generation of the model
+            mvc_cache.register_model(cls.model)
+
+    def get_cache_key(self):
+        """
+        Return the cache key of the list page, which consists of the view class, the canonical query string,
+        the permission fingerprint and the generations of the dependent models
+        """
+        request = self.request
+        return "mvc_listview_{}".format(hashvalue("{}.{}|{}|{}|{}|{}|{}".format(
+            self.__class__.__module__,self.__class__.__name__,
+            request.path,
+            self.requesturl.canonical_querystring(defaults={"page":1,"order_by":self.default_order}),
+            mvc_cache.get_permission_fingerprint(request.user),
+            "{}:{}".format(request.user.pk,request.META.get("CSRF_COOKIE")) if self.cache_vary_on_user else "",
+            mvc_cache.get_generations([self.model] + list(self.cache_dependent_models or []))
+        )))
+
+    def is_cacheable(self):
+        """
+        Only the default get request without pending messages is cacheable
+        """
+        if not self.cache_timeout or self.request.method != "GET" or self.request.is_ajax() or not self.is_default_action:
+            return False
+        #the pending messages will be rendered in the page.
+        if len(messages.get_messages(self.request)):
+            return False
+        return True
+
     def get_filter_class(self):
         return self.filter_class
 
@@ -1031,6 +1235,8 @@ class ListBaseView(UrlpatternsMixin,ModelMixin,RequestActionMixin,UserMessageMix
                 if filterclass:
                     data_filter = self.get_filter_class()(self.filterform,request=self.request,queryset=self.queryset)
                     queryset = data_filter.qs
+                    if getattr(self.filterform,"facet_fields",None) and not self.is_rows_request():
+                        self.filterform.facet_counts = data_filter.get_facet_counts(self.filterform.facet_fields,timeout=self.filterform.facet_cache_timeout)
                 else:
                     queryset = self.model.objects.all() if self.queryset is None else self.queryset
             else:
@@ -1058,7 +1264,19 @@ class ListBaseView(UrlpatternsMixin,ModelMixin,RequestActionMixin,UserMessageMix
                     'class_name': self.__class__.__name__,
                 })
         page_size = self.get_paginate_by(queryset)
-        if page_size:
+        keyset = self.get_keyset_ordering() if page_size else None
+        if keyset and self.cursor_parameter in self.request.GET and self.is_rows_request():
+            queryset = self.get_keyset_page(queryset,keyset,self.request.GET.get(self.cursor_parameter),page_size)
+            self.paging_context = {
+                'paginator': None,
+                'page_obj': None,
+                'is_paginated': False,
+                'object_list': queryset
+            }
+        elif page_size:
+            if keyset:
+                #order the offset pages as the keyset pages, the next rows are loaded by the keyset cursor
+                queryset = queryset.order_by(*self.get_keyset_order_by(keyset))
             paginator, page, queryset, is_paginated = self.paginate_queryset(queryset, page_size)
             self.paging_context = {
                 'paginator': paginator,
@@ -1076,6 +1294,139 @@ class ListBaseView(UrlpatternsMixin,ModelMixin,RequestActionMixin,UserMessageMix
 
         return queryset
 
+    def is_rows_request(self):
+        """
+        Return True if the request only requires the rows of the list in json format
+        """
+        if self.request.method != "GET":
+            return False
+        fmt = self.request.GET.get(self.format_parameter)
+        if fmt:
+            return fmt == "json"
+        return self.request.META.get("HTTP_ACCEPT","").startswith("application/json")
+
+    def get_keyset_ordering(self):
+        """
+        Return (ordering field,descending) if the list can be paged with a keyset cursor; otherwise return None
+        Only the list ordered by a single not null concrete field of the model supports keyset cursor
+        """
+        ordering = self.get_ordering()
+        if not ordering:
+            if self.model._meta.ordering:
+                #ordered by the default ordering of the model
+                return None
+            ordering = "pk"
+        elif not isinstance(ordering,str):
+            if len(ordering) != 1 or not isinstance(ordering[0],str):
+                return None
+            ordering = ordering[0]
+        descending = ordering.startswith("-")
+        name = ordering.lstrip("-+")
+        try:
+            field = self.model._meta.pk if name == "pk" else self.model._meta.get_field(name)
+        except:
+            return None
+        if not field.concrete or field.many_to_many or field.null:
+            return None
+        return (field,descending)
+
+    def get_cursor(self,obj,keyset=None):
+        """
+        Return the signed keyset cursor which points to the object
+        """
+        keyset = keyset or self.get_keyset_ordering()
+        if not keyset:
+            return None
+        return signing.dumps([keyset[0].value_to_string(obj),str(obj.pk)],salt="django_mvc.cursor.{}".format(self.model._meta.label_lower))
+
+    def get_keyset_order_by(self,keyset):
+        """
+        Return the ordering of the keyset; the rows with the same value are ordered by pk
+        """
+        field,descending = keyset
+        prefix = "-" if descending else ""
+        if field.primary_key:
+            return ["{}pk".format(prefix)]
+        else:
+            return ["{}{}".format(prefix,field.attname),"{}pk".format(prefix)]
+
+    def get_keyset_page(self,queryset,keyset,cursor,page_size):
+        """
+        Return the list of the rows after the cursor, and set the cursor of the next rows to 'next_cursor'
+        Return the first page if cursor is empty; respond with 400 if the cursor is invalid
+        """
+        field,descending = keyset
+        pkfield = self.model._meta.pk
+        lookup = "lt" if descending else "gt"
+        if cursor:
+            try:
+                value,pk = signing.loads(cursor,salt="django_mvc.cursor.{}".format(self.model._meta.label_lower))
+                pk = pkfield.to_python(pk)
+                value = None if field.primary_key else field.to_python(value)
+            except (signing.BadSignature,ValidationError,ValueError,TypeError):
+                raise HttpResponseRedirectException(HttpResponseBadRequest("The cursor is invalid, please reload the page."))
+            if field.primary_key:
+                queryset = queryset.filter(**{"pk__{}".format(lookup):pk})
+            else:
+                queryset = queryset.filter(Q(**{"{}__{}".format(field.attname,lookup):value}) | Q(**{field.attname:value,"pk__{}".format(lookup):pk}))
+        queryset = queryset.order_by(*self.get_keyset_order_by(keyset))
+
+        rows = list(queryset[:page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_cursor = self.get_cursor(rows[-1],keyset)
+        else:
+            self.next_cursor = None
+        return rows
+
+    def get_rows_next_url(self,object_list=None):
+        """
+        Return the url to load the next rows; return None if no more rows
+        """
+        if self.paging_context and self.paging_context.get("page_obj"):
+            page = self.paging_context["page_obj"]
+            if not page.has_next():
+                return None
+            keyset = self.get_keyset_ordering()
+            object_list = list(object_list) if object_list is not None else None
+            if keyset and object_list:
+                #switch to keyset paging after the first page
+                return "{}{}".format(self.request.path,self.requesturl.replace_querystring(excludes=("page",),**{self.format_parameter:"json",self.cursor_parameter:self.get_cursor(object_list[-1],keyset)}))
+            else:
+                return "{}{}".format(self.request.path,self.requesturl.replace_querystring(excludes=(self.cursor_parameter,),**{self.format_parameter:"json","page":page.next_page_number()}))
+        elif getattr(self,"next_cursor",None):
+            return "{}{}".format(self.request.path,self.requesturl.replace_querystring(excludes=("page",),**{self.format_parameter:"json",self.cursor_parameter:self.next_cursor}))
+        else:
+            return None
+
+    def _json_value(self,value):
+        if isinstance(value,models.Model):
+            return value.pk
+        elif isinstance(value,(models.query.QuerySet,list,tuple)):
+            return [self._json_value(v) for v in value]
+        else:
+            return value
+
+    def get_rows_data(self):
+        """
+        Return the rows of current page and the url of the next rows
+        """
+        selection = self.get_selection()
+        rows = []
+        for dataform in self.listform:
+            row = {"pk":dataform.pk}
+            if self.json_rows == "values":
+                row["values"] = dict((field.name,self._json_value(field.value())) for field in dataform)
+            else:
+                row["html"] = [field.html("<td {attrs}>{widget}</td>") for field in dataform]
+            if selection is not None and dataform.pk in selection:
+                row["selected"] = True
+            rows.append(row)
+        return {
+            "rows":rows,
+            "next":self.get_rows_next_url(self.object_list)
+        }
+
     def get_context_data(self, *, object_list=None, **kwargs):
         """Get the context for this view."""
         queryset = object_list if object_list is not None else self.object_list
@@ -1087,24 +1438,16 @@ class ListBaseView(UrlpatternsMixin,ModelMixin,RequestActionMixin,UserMessageMix
         context.update(kwargs)
         context["object_list_length"] = len(queryset)
         #add action related context data
-        if self.request.method == 'GET':
-            if self.request.GET.get("select_all") == "true" :
-                context["select_all"] = "true"
-            elif "selectedpks" in self.request.GET:
-                context["selectedpks"] = [int(pk) for pk in self.request.GET.getlist("selectedpks")]
-            elif "pk" in self.kwargs:
-                context["selectedpks"] = [self.kwargs["pk"]]
-            else:
-                context["selectedpks"] = []
+        selection = self.get_selection()
+        if selection is None:
+            context["selectedpks"] = []
         else:
-            if self.request.POST.get("select_all") == "true" :
+            if selection.select_all:
                 context["select_all"] = "true"
-            elif "selectedpks" in self.request.POST:
-                context["selectedpks"] = [int(pk) for pk in self.request.POST.getlist("selectedpks")]
-            elif "pk" in self.kwargs:
-                context["selectedpks"] = [self.kwargs["pk"]]
-            else:
-                context["selectedpks"] = []
+            if selection.token:
+                context["selection"] = selection.token
+            #only the selected pks in current page are required to render the page
+            context["selectedpks"] = [o.pk for o in queryset if o.pk in selection]
         
         context["action__"] = self.selected_action
 
@@ -1112,47 +1455,53 @@ class ListBaseView(UrlpatternsMixin,ModelMixin,RequestActionMixin,UserMessageMix
         self.post_update_context_data(context)
         return context
 
+    def get_selection(self):
+        """
+        Return the selection set of current request; return None if select nothing
+        The selection set is passed between the requests through a token if it was saved before,
+        otherwise it is parsed from the parameters 'select_all', 'selectedpks' and 'excludedpks'
+        """
+        if not hasattr(self,"_selection"):
+            data = self.request.GET if self.request.method == 'GET' else self.request.POST
+            try:
+                self._selection = SelectionSet.from_request(self.request,self.model,data,self.kwargs.get("pk"))
+            except InvalidSelection as ex:
+                nexturl = getattr(self,"nexturl",None)
+                if nexturl:
+                    messages.add_message(self.request,messages.ERROR,str(ex))
+                    raise HttpResponseRedirectException(HttpResponseRedirect(nexturl))
+                else:
+                    raise HttpResponseRedirectException(HttpResponseBadRequest(str(ex)))
+        return self._selection
+
     def get_selected_ids(self,queryset=None):
         """
         return None is select all
         return empty list if select nothing
         return list of ids if select some 
         """
-        if self.request.method == 'GET':
-            if self.request.GET.get("select_all") == "true" :
-                return None
-            elif "selectedpks" in self.request.GET:
-                return [int(pk) for pk in self.request.GET.getlist("selectedpks")]
-            elif "pk" in self.kwargs:
-                return [self.kwargs["pk"]]
-            else:
-                return []
+        selection = self.get_selection()
+        if selection is None:
+            return []
         else:
-            if self.request.POST.get("select_all") == "true" :
-                return None
-            elif "selectedpks" in self.request.POST:
-                return [int(pk) for pk in self.request.POST.getlist("selectedpks")]
-            elif "pk" in self.kwargs:
-                return [self.kwargs["pk"]]
-            else:
-                return []
+            return selection.pks
 
     def get_queryset_4_selected(self,queryset=None):
-        selected_ids = self.get_selected_ids(queryset)
-        if selected_ids is None :
+        selection = self.get_selection()
+        if selection is not None and selection.select_all:
             filterformclass = self.get_filterform_class()
             if not filterformclass:
-                return self.model.objects.all() if queryset is None else queryset
+                queryset = self.model.objects.all() if queryset is None else queryset
             else:
-                self.filterform = filterformclass(data=self.request.POST,request=self.request)
+                self.filterform = filterformclass(data=selection.filter_data,request=self.request)
                 if not self.filterform.is_valid():
-                    raise http.HttpResponseServerError()
+                    raise Exception("The filter of the selected {} is invalid.".format(self.model_verbose_name))
 
                 data_filter = self.get_filter_class()(self.filterform,request=self.request,queryset=queryset)
                 queryset = data_filter.qs
-                #print("All {} records are selected.".format(len(queryset)))
-        elif selected_ids:
-            queryset = (queryset or self.model.objects).filter(pk__in=selected_ids)
+            queryset = selection.filter_queryset(queryset)
+        elif selection is not None and not selection.is_empty:
+            queryset = selection.filter_queryset(self.model.objects.all() if queryset is None else queryset)
         elif self.nexturl:
             messages.add_message(self.request,messages.ERROR,"No {} is selected".format(self.model_verbose_name))
             raise HttpResponseRedirectException(HttpResponseRedirect(self.nexturl))
@@ -1213,6 +1562,8 @@ class ListBaseView(UrlpatternsMixin,ModelMixin,RequestActionMixin,UserMessageMix
             'listform':self.listform,
             'nexturl':self.nexturl
         }
+        #save the selection set and pass the token to the confirm page instead of the selected pks
+        context["selection"] = self.get_selection().save(self.request)
         self.add_htmlmedia_context(context)
         return context
 
@@ -1234,10 +1585,9 @@ class ListBaseView(UrlpatternsMixin,ModelMixin,RequestActionMixin,UserMessageMix
         return self.deleteconfirm_get()
 
     def deleteconfirmed_post(self):
-        selected_ids = self.get_selected_ids()
         #remove selected rows.
         is_protected = None
-        for o in self.model.objects.filter(pk__in=selected_ids):
+        for o in self.get_queryset_4_selected():
             msg = "Delete {}({} - {}) successfully.".format(o._meta.verbose_name,o.pk,o)
             if is_protected is None:
                 is_protected = ModelDependencyTree(o.__class__).is_protected
@@ -1257,9 +1607,8 @@ class ListBaseView(UrlpatternsMixin,ModelMixin,RequestActionMixin,UserMessageMix
         return self.archiveconfirm_get()
 
     def archiveconfirmed_post(self):
-        selected_ids = self.get_selected_ids()
         #remove selected rows.
-        for o in self.model.objects.filter(pk__in=selected_ids):
+        for o in self.get_queryset_4_selected():
             try:
                 if o.is_archived:
                     messages.add_message(self.request,messages.WARNING,"{}({} - {}) is already archived.".format(o._meta.verbose_name,o.pk,o))
@@ -1293,10 +1642,31 @@ class ListView(ErrorMixin,HtmlMediaMixin,NextUrlMixin,ListBaseView):
         return self.listform_class
 
     def get(self, request, *args, **kwargs):
+        if self.is_rows_request() and isinstance(self.get_listform_class(),type) and issubclass(self.get_listform_class(),ListForm):
+            self.object_list = self.get_queryset()
+            self.listform = self.get_listform()
+            return JsonResponse(self.get_rows_data(),encoder=self.jsonencoder)
+
+        if self.is_cacheable():
+            cache = mvc_cache.get_cache()
+            key = self.get_cache_key()
+            response = cache.get(key)
+            if response is not None:
+                return response
+        else:
+            key = None
+
         self.object_list = self.get_queryset()
         self.listform = self.get_listform()
         context = self.get_context_data()
-        return self.render_to_response(context)
+        response = self.render_to_response(context)
+        if key:
+            timeout = self.cache_timeout
+            if hasattr(response,"add_post_render_callback"):
+                response.add_post_render_callback(lambda r:cache.set(key,r,timeout) if r.status_code == 200 else None)
+            elif response.status_code == 200:
+                cache.set(key,response,timeout)
+        return response
 
     def post(self,request,*args,**kwargs):
         raise Http404("Post method is not supported.")
@@ -1308,6 +1678,9 @@ class ListView(ErrorMixin,HtmlMediaMixin,NextUrlMixin,ListBaseView):
             context["listform"] = self.listform
         context["modelname"] = self.model_verbose_name
         context["requesturl"] = self.requesturl
+        if self.infinite_scroll and isinstance(self.listform,ListForm):
+            context["infinite_scroll"] = True
+            context["rows_next"] = self.get_rows_next_url(context.get("object_list"))
         if self.get_filterform_class():
             context["filterform"] = self.filterform
             context["filtertool"] = self.filtertool
@@ -1329,13 +1702,12 @@ class ManyToManyListView(ManyToManyModelMixin,ListView):
         context['confirm_message'] = "Are you sure you wish to delete the {0} from {1}({2})?".format(self.model._meta.verbose_name if len(self.object_list) < 2 else self.model._meta.verbose_name_plural,self.pmodel._meta.verbose_name,self.pobject)
 
     def deleteconfirmed_post(self):
-        selected_ids = self.get_selected_ids()
         #remove selected rows.
-        is_protected = None
-        for o in self.model.objects.filter(pk__in=selected_ids):
-            msg = "Delete {0}({1} - {2}) from {3}({4}) successfully.".format(o._meta.verbose_name,o.pk,o,self.pmodel._meta.verbose_name,self.pobject)
-            getattr(self.pobject,self.many_to_many_field_name).remove(o)
-            messages.add_message(self.request,messages.SUCCESS,msg)
+        objs = list(self.get_queryset_4_selected())
+        if objs:
+            getattr(self.pobject,self.many_to_many_field_name).remove(*objs)
+        for o in objs:
+            messages.add_message(self.request,messages.SUCCESS,"Delete {0}({1} - {2}) from {3}({4}) successfully.".format(o._meta.verbose_name,o.pk,o,self.pmodel._meta.verbose_name,self.pobject))
     
         return HttpResponseRedirect(self.get_success_url())
         
@@ -1368,8 +1740,8 @@ class ListEditView(ListView):
             if isinstance(self.listform,FormSet):
                 self.listform.save()
             return HttpResponseRedirect(self.get_success_url())
-        except:
-            self.listform.add_error("",str(ex))
+        except Exception as ex:
+            self.listform.add_error(None,str(ex))
             return self.form_invalid()
 
 
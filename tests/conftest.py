@@ -0,0 +1,16 @@
+try:
+    import django
+except ImportError:
+    django = None
+
+if django:
+    from django.conf import settings
+
+    if not settings.configured:
+        settings.configure(
+            INSTALLED_APPS=["django.contrib.contenttypes","django.contrib.auth"],
+            DATABASES={"default":{"ENGINE":"django.db.backends.sqlite3","NAME":":memory:"}},
+            CACHES={"default":{"BACKEND":"django.core.cache.backends.locmem.LocMemCache"}},
+            USE_TZ=True,
+        )
+        django.setup()
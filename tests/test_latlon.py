@@ -0,0 +1,59 @@
+"""
+Compare the degrees minutes seconds text with the text rendered by the LatLon library
+"""
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("django")
+LatLon = pytest.importorskip("LatLon")
+hypothesis = pytest.importorskip("hypothesis")
+
+from hypothesis import given,settings,strategies as st
+
+from django_mvc.forms.widgets import latlon
+
+lons = st.floats(min_value=-540,max_value=540,allow_nan=False,allow_infinity=False)
+lats = st.floats(min_value=-90,max_value=90,allow_nan=False,allow_infinity=False)
+#the edge cases: whole degrees and minutes, and the tiny seconds rendered with an exponent
+edges = st.sampled_from([0.0,-0.0,1e-9,-1e-9,1e-7,-1e-7,0.5,-0.5,1/60.,-1/60.,179.99999999,-179.99999999,180.0,-180.0,360.0,90.0,-90.0])
+
+def latlon_dms(lon,lat):
+    """
+    The text rendered by the LatLon library, as DmsCoordinateDisplay did before
+    """
+    c = LatLon.LatLon(LatLon.Longitude(lon),LatLon.Latitude(lat))
+    text = c.to_string('d% %m% %S% %H')
+    lon = text[0].split(' ')
+    lat = text[1].split(' ')
+
+    lon[2] = str(round(eval(lon[2]),1))
+    lat[2] = str(round(eval(lat[2]),1))
+
+    lat_str = lat[0] + u'\N{DEGREE SIGN} ' + lat[1].zfill(2) + '\' ' + lat[2].zfill(4) + '\" ' + lat[3]
+    lon_str = lon[0] + u'\N{DEGREE SIGN} ' + lon[1].zfill(2) + '\' ' + lon[2].zfill(4) + '\" ' + lon[3]
+    return 'Lat/Lon ' + lat_str + ', ' + lon_str
+
+@settings(max_examples=2000)
+@given(lon=st.one_of(lons,edges),lat=st.one_of(lats,edges.filter(lambda v:-90 <= v <= 90)))
+def test_format_dms(lon,lat):
+    assert latlon.format_dms(lon,lat) == latlon_dms(lon,lat)
+
+points = st.lists(st.tuples(st.one_of(lons,edges),st.one_of(lats,edges.filter(lambda v:-90 <= v <= 90))),min_size=latlon.numpy_threshold + 1,max_size=200)
+
+@settings(max_examples=200)
+@given(points=points)
+def test_format_dms_many(points):
+    expected = [latlon_dms(lon,lat) for lon,lat in points]
+    lons = [lon for lon,lat in points]
+    lats = [lat for lon,lat in points]
+    assert latlon.format_dms_many(lons,lats) == expected
+
+@settings(max_examples=200)
+@given(points=points)
+def test_format_dms_many_without_numpy(points):
+    expected = [latlon_dms(lon,lat) for lon,lat in points]
+    lons = [lon for lon,lat in points]
+    lats = [lat for lon,lat in points]
+    with mock.patch.object(latlon,"numpy",None):
+        assert latlon.format_dms_many(lons,lats) == expected
@@ -0,0 +1,68 @@
+"""
+The selection set and the selected queryset of the list views
+"""
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("django")
+
+from django_mvc.selection import SelectionSet
+from django_mvc.views.views import ListBaseView
+
+def test_select_all_is_true():
+    selection = SelectionSet(mock.Mock(),filter={"name":["a"]})
+    assert selection
+    assert selection.select_all
+    assert selection.pks is None
+    with pytest.raises(Exception):
+        len(selection)
+
+def test_selected_pks():
+    selection = SelectionSet(mock.Mock(),includes=[[1,3]],excludes=[[2,2]])
+    assert selection
+    assert 1 in selection and 2 not in selection
+    assert selection.pks == [1,3]
+    assert not SelectionSet(mock.Mock())
+
+def test_queryset_4_select_all():
+    queryset = mock.MagicMock()
+    view = mock.Mock(spec=ListBaseView)
+    view.get_selection.return_value = SelectionSet(queryset.model,filter={},excludes=[[5,5]])
+    view.get_filterform_class.return_value = None
+
+    result = ListBaseView.get_queryset_4_selected(view,queryset)
+
+    queryset.exclude.assert_called_once()
+    assert result is queryset.exclude.return_value
+
+def test_queryset_4_nothing_selected():
+    view = mock.Mock(spec=ListBaseView)
+    view.get_selection.return_value = None
+    view.nexturl = None
+    view.model_verbose_name = "rows"
+    with pytest.raises(Exception):
+        ListBaseView.get_queryset_4_selected(view,mock.MagicMock())
+
+def test_select_post_select_all():
+    from django_mvc.views.views import ManyToManyModelMixin
+    selectable = mock.MagicMock()
+    view = mock.Mock()
+    view.get_selected_ids.return_value = None
+    view.get_selectable_queryset.return_value = selectable
+    view.get_queryset_4_selected.return_value = mock.MagicMock()
+    view.select_with_signals = True
+    view.many_to_many_field_name = "members"
+    view.select_batch_size = 100
+    manager = view.pobject.members
+    manager.through._meta.auto_created = True
+    manager.exclude.return_value.values_list.return_value = [1]
+    selected = selectable.filter.return_value.order_by.return_value.values.return_value
+    selected.exclude.return_value.values_list.return_value = [2]
+
+    with mock.patch("django_mvc.views.views.transaction"),mock.patch("django_mvc.views.views.HttpResponseRedirect"):
+        ManyToManyModelMixin.select_post(view)
+
+    view.get_queryset_4_selected.assert_called_once_with(selectable)
+    manager.remove.assert_called_once_with(1)
+    manager.add.assert_called_once_with(2)